@@ -1,4 +1,8 @@
 import os
+import shutil
+import tempfile
+
+import pytest
 
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 root_dir_content = os.listdir(BASE_DIR)
@@ -33,6 +37,20 @@ assert any(app in INSTALLED_APPS for app in ['posts.apps.PostsConfig', 'posts'])
     'Пожалуйста зарегистрируйте приложение в `settings.INSTALLED_APPS`'
 )
 
+
+@pytest.fixture(scope='session', autouse=True)
+def temporary_cache_directory():
+    # Кэши SQLite на время тестов переносятся во временный каталог.
+    from django.test import override_settings
+
+    from core.test_runner import temporary_caches
+
+    directory = tempfile.mkdtemp()
+    with override_settings(CACHES=temporary_caches(directory)):
+        yield
+    shutil.rmtree(directory, ignore_errors=True)
+
+
 pytest_plugins = [
     'tests.fixtures.fixture_user',
     'tests.fixtures.fixture_data',
@@ -0,0 +1,204 @@
+"""Кэш в файле SQLite, общий для всех процессов на одной машине.
+
+В отличие от LocMemCache, все WSGI-воркеры видят одни и те же записи и
+их инвалидацию. Записи с истёкшим TIMEOUT не отдаются и удаляются при
+чистке; когда записей больше MAX_ENTRIES, удаляется 1/CULL_FREQUENCY
+давно не читавшихся (LRU).
+"""
+import os
+import pickle
+import sqlite3
+import threading
+import time
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS cache ('
+    ' key TEXT PRIMARY KEY,'
+    ' value BLOB NOT NULL,'
+    ' expires REAL,'
+    ' accessed REAL NOT NULL'
+    ') WITHOUT ROWID',
+    'CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed)',
+)
+
+# Время последнего чтения обновляется не чаще раза в секунду, чтобы
+# горячие ключи не превращали каждое чтение в запись.
+ACCESS_RESOLUTION = 1
+# Размер кэша проверяется раз в CULL_EVERY записей одного процесса.
+CULL_EVERY = 64
+# Старые сборки SQLite допускают не больше 999 параметров в запросе.
+MAX_VARIABLES = 500
+
+
+class SQLiteCache(BaseCache):
+    def __init__(self, location, params):
+        super().__init__(params)
+        self.location = location
+        options = params.get('OPTIONS', {})
+        self.busy_timeout = float(options.get('BUSY_TIMEOUT', 5))
+        self._local = threading.local()
+        self._writes = 0
+
+    @property
+    def connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or self._local.pid != os.getpid():
+            directory = os.path.dirname(self.location)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            connection = sqlite3.connect(
+                self.location,
+                timeout=self.busy_timeout,
+                isolation_level=None,
+                check_same_thread=False,
+            )
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            for statement in SCHEMA:
+                connection.execute(statement)
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    def _key(self, key, version):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return key
+
+    def _fetch(self, keys):
+        now = time.time()
+        rows = []
+        for start in range(0, len(keys), MAX_VARIABLES):
+            chunk = keys[start:start + MAX_VARIABLES]
+            rows += self.connection.execute(
+                f'SELECT key, value, expires, accessed FROM cache '
+                f'WHERE key IN ({", ".join("?" * len(chunk))})',
+                chunk,
+            ).fetchall()
+        found = {}
+        touched = []
+        for key, value, expires, accessed in rows:
+            if expires is not None and expires <= now:
+                continue
+            found[key] = pickle.loads(value)
+            if now - accessed > ACCESS_RESOLUTION:
+                touched.append((now, key))
+        if touched:
+            with self.connection as connection:
+                connection.execute('BEGIN IMMEDIATE')
+                connection.executemany(
+                    'UPDATE cache SET accessed = ? WHERE key = ?', touched
+                )
+        return found
+
+    def _store(self, items, timeout, mode='REPLACE'):
+        expires = self.get_backend_timeout(timeout)
+        now = time.time()
+        rows = [
+            (key, pickle.dumps(value, pickle.HIGHEST_PROTOCOL), expires, now)
+            for key, value in items
+        ]
+        connection = self.connection
+        with connection:
+            connection.execute('BEGIN IMMEDIATE')
+            if mode == 'IGNORE':
+                connection.executemany(
+                    'DELETE FROM cache WHERE key = ? AND expires <= ?',
+                    [(row[0], now) for row in rows],
+                )
+            cursor = connection.executemany(
+                f'INSERT OR {mode} INTO cache (key, value, expires, accessed) '
+                f'VALUES (?, ?, ?, ?)',
+                rows,
+            )
+        self._writes += len(rows)
+        if self._writes >= CULL_EVERY:
+            self._writes = 0
+            self._cull()
+        return cursor.rowcount
+
+    def _cull(self):
+        connection = self.connection
+        with connection:
+            connection.execute('BEGIN IMMEDIATE')
+            connection.execute(
+                'DELETE FROM cache WHERE expires <= ?', (time.time(),)
+            )
+            count = connection.execute(
+                'SELECT COUNT(*) FROM cache'
+            ).fetchone()[0]
+            if count > self._max_entries:
+                if self._cull_frequency == 0:
+                    connection.execute('DELETE FROM cache')
+                    return
+                connection.execute(
+                    'DELETE FROM cache WHERE key IN ('
+                    ' SELECT key FROM cache ORDER BY accessed LIMIT ?'
+                    ')',
+                    (count // self._cull_frequency,),
+                )
+
+    def get(self, key, default=None, version=None):
+        key = self._key(key, version)
+        return self._fetch([key]).get(key, default)
+
+    def get_many(self, keys, version=None):
+        if not keys:
+            return {}
+        keys = {self._key(key, version): key for key in keys}
+        return {
+            keys[key]: value
+            for key, value in self._fetch(list(keys)).items()
+        }
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self._store([(self._key(key, version), value)], timeout)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        self._store(
+            [(self._key(key, version), value) for key, value in data.items()],
+            timeout,
+        )
+        return []
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        return self._store([(key, value)], timeout, mode='IGNORE') == 1
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        with self.connection as connection:
+            cursor = connection.execute(
+                'UPDATE cache SET expires = ? WHERE key = ? '
+                'AND (expires IS NULL OR expires > ?)',
+                (self.get_backend_timeout(timeout), key, time.time()),
+            )
+        return cursor.rowcount == 1
+
+    def has_key(self, key, version=None):
+        key = self._key(key, version)
+        return key in self._fetch([key])
+
+    def delete(self, key, version=None):
+        self.delete_many([key], version=version)
+
+    def delete_many(self, keys, version=None):
+        keys = [self._key(key, version) for key in keys]
+        if not keys:
+            return
+        with self.connection as connection:
+            connection.execute('BEGIN IMMEDIATE')
+            connection.executemany(
+                'DELETE FROM cache WHERE key = ?', [(key,) for key in keys]
+            )
+
+    def clear(self):
+        with self.connection as connection:
+            connection.execute('DELETE FROM cache')
+
+    def close(self, **kwargs):
+        # Соединение живёт всё время работы потока: открывать файл и
+        # включать WAL на каждый запрос дороже, чем держать его открытым.
+        pass
@@ -0,0 +1,198 @@
+"""Двухуровневый кэш: LRU в памяти процесса (L1) перед общим кэшем (L2).
+
+Чтения сначала идут в L1 и только при промахе в L2; записи пишутся в
+оба уровня. Удаления из L2 меняют общую метку версии. Каждый процесс
+сверяет её не реже раза в L1_CHECK_INTERVAL секунд и при расхождении
+сбрасывает свой L1, так что инвалидация из сигналов доходит до всех
+воркеров за ограниченное время. Перезапись ключа другим процессом
+становится видна не позже L1_TIMEOUT.
+
+Строки, байты и числа хранятся в L1 как есть, остальные значения
+сериализуются, чтобы разные запросы не получали один изменяемый объект.
+"""
+import pickle
+import threading
+import time
+import uuid
+from collections import Counter, OrderedDict
+
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+STAMP_KEY = 'tiered:stamp'
+
+IMMUTABLE_TYPES = (str, bytes, int, float, bool, type(None))
+
+_tiers = {}
+_tiers_lock = threading.Lock()
+
+
+class _Pickled(bytes):
+    pass
+
+
+class LocalTier:
+    """L1 одного процесса, общий для всех его потоков."""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.stamp = None
+        self.checked = 0
+        self.stats = Counter()
+
+    def get(self, key, now):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            value, expires = entry
+            if expires <= now:
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return entry
+
+    def set(self, key, value, expires):
+        with self.lock:
+            self.entries[key] = (value, expires)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def discard(self, keys):
+        with self.lock:
+            for key in keys:
+                self.entries.pop(key, None)
+
+    def clear(self, stamp=None):
+        with self.lock:
+            self.entries.clear()
+            self.stamp = stamp
+
+
+def get_tier(name, max_entries):
+    with _tiers_lock:
+        if name not in _tiers:
+            _tiers[name] = LocalTier(max_entries)
+        return _tiers[name]
+
+
+class TieredCache(BaseCache):
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self.l2_alias = options.get('L2', 'l2')
+        self.l1_timeout = float(options.get('L1_TIMEOUT', 5))
+        self.check_interval = float(options.get('L1_CHECK_INTERVAL', 1))
+        self.l1 = get_tier(
+            location or self.l2_alias,
+            int(options.get('L1_MAX_ENTRIES', 1000)),
+        )
+
+    @property
+    def l2(self):
+        return caches[self.l2_alias]
+
+    def stats(self):
+        """Счётчики попаданий и промахов по уровням в этом процессе."""
+        return dict(self.l1.stats)
+
+    def _key(self, key, version):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return key
+
+    def _check_stamp(self, now):
+        if now - self.l1.checked < self.check_interval:
+            return
+        self.l1.checked = now
+        stamp = self.l2.get(STAMP_KEY)
+        if stamp != self.l1.stamp:
+            self.l1.clear(stamp)
+
+    def _bump_stamp(self):
+        stamp = uuid.uuid4().hex
+        self.l2.set(STAMP_KEY, stamp, timeout=None)
+        self.l1.clear(stamp)
+        self.l1.checked = time.monotonic()
+
+    def _remember(self, key, value, timeout=DEFAULT_TIMEOUT):
+        expires = time.monotonic() + self.l1_timeout
+        if timeout is not DEFAULT_TIMEOUT and timeout is not None:
+            expires = min(expires, time.monotonic() + timeout)
+        if not isinstance(value, IMMUTABLE_TYPES):
+            value = _Pickled(pickle.dumps(value, pickle.HIGHEST_PROTOCOL))
+        self.l1.set(key, value, expires)
+
+    def _recall(self, value):
+        if isinstance(value, _Pickled):
+            return pickle.loads(value)
+        return value
+
+    def get(self, key, default=None, version=None):
+        return self.get_many([key], version=version).get(key, default)
+
+    def get_many(self, keys, version=None):
+        now = time.monotonic()
+        self._check_stamp(now)
+        found = {}
+        missing = []
+        for key in keys:
+            entry = self.l1.get(self._key(key, version), now)
+            if entry is None:
+                missing.append(key)
+            else:
+                found[key] = self._recall(entry[0])
+        stats = self.l1.stats
+        stats['l1_hits'] += len(found)
+        stats['l1_misses'] += len(missing)
+        if missing:
+            fetched = self.l2.get_many(missing, version=version)
+            stats['l2_hits'] += len(fetched)
+            stats['l2_misses'] += len(missing) - len(fetched)
+            for key, value in fetched.items():
+                self._remember(self._key(key, version), value)
+            found.update(fetched)
+        return found
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.l2.set(key, value, timeout=timeout, version=version)
+        self._remember(self._key(key, version), value, timeout)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        failed = self.l2.set_many(data, timeout=timeout, version=version)
+        for key, value in data.items():
+            if key not in failed:
+                self._remember(self._key(key, version), value, timeout)
+        return failed
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        added = self.l2.add(key, value, timeout=timeout, version=version)
+        if added:
+            self._remember(self._key(key, version), value, timeout)
+        else:
+            self.l1.discard([self._key(key, version)])
+        return added
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        self.l1.discard([self._key(key, version)])
+        return self.l2.touch(key, timeout=timeout, version=version)
+
+    def has_key(self, key, version=None):
+        return key in self.get_many([key], version=version)
+
+    def delete(self, key, version=None):
+        self.delete_many([key], version=version)
+
+    def delete_many(self, keys, version=None):
+        keys = list(keys)
+        if not keys:
+            return
+        self.l2.delete_many(keys, version=version)
+        self._bump_stamp()
+
+    def clear(self):
+        self.l2.clear()
+        self._bump_stamp()
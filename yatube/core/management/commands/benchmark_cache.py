@@ -0,0 +1,89 @@
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.management.base import BaseCommand
+
+from core.cache_backends.sqlite import SQLiteCache
+
+
+def fill(backend, keys, value):
+    for key in keys:
+        backend.set(key, value)
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает SQLiteCache с LocMemCache и FileBasedCache: скорость '
+        'операций и долю попаданий между процессами.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--keys', type=int, default=1000)
+        parser.add_argument('--value-size', type=int, default=2048)
+        parser.add_argument('--many', type=int, default=20)
+
+    def get_backends(self, directory):
+        params = {'OPTIONS': {'MAX_ENTRIES': 1000000}}
+        return {
+            'locmem': LocMemCache('benchmark', params),
+            'filebased': FileBasedCache(
+                os.path.join(directory, 'files'), params
+            ),
+            'sqlite': SQLiteCache(
+                os.path.join(directory, 'cache.sqlite3'), params
+            ),
+        }
+
+    def measure(self, operation, count):
+        started = time.perf_counter()
+        operation()
+        elapsed = time.perf_counter() - started
+        return count / elapsed if elapsed else float('inf')
+
+    def cross_process_hit_rate(self, backend, keys, value):
+        process = multiprocessing.Process(
+            target=fill, args=(backend, keys, value)
+        )
+        process.start()
+        process.join()
+        return len(backend.get_many(keys)) / len(keys)
+
+    def handle(self, *args, **options):
+        keys = [f'key:{i}' for i in range(options['keys'])]
+        value = os.urandom(options['value_size'])
+        many = options['many']
+        chunks = [keys[i:i + many] for i in range(0, len(keys), many)]
+        directory = tempfile.mkdtemp()
+        self.stdout.write(
+            f'{"backend":<10} {"set/s":>10} {"get/s":>10} '
+            f'{"miss/s":>10} {"get_many/s":>11} {"shared":>7}'
+        )
+        try:
+            for name, backend in self.get_backends(directory).items():
+                set_rate = self.measure(
+                    lambda: fill(backend, keys, value), len(keys)
+                )
+                get_rate = self.measure(
+                    lambda: [backend.get(key) for key in keys], len(keys)
+                )
+                miss_rate = self.measure(
+                    lambda: [backend.get(f'miss:{key}') for key in keys],
+                    len(keys),
+                )
+                many_rate = self.measure(
+                    lambda: [backend.get_many(chunk) for chunk in chunks],
+                    len(keys),
+                )
+                backend.clear()
+                shared = self.cross_process_hit_rate(backend, keys, value)
+                self.stdout.write(
+                    f'{name:<10} {set_rate:>10.0f} {get_rate:>10.0f} '
+                    f'{miss_rate:>10.0f} {many_rate:>11.0f} {shared:>7.0%}'
+                )
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
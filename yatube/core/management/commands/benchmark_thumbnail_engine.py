@@ -0,0 +1,154 @@
+import multiprocessing
+import os
+import resource
+import shutil
+import statistics
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils.module_loading import import_string
+from PIL import Image
+from sorl.thumbnail.base import ThumbnailBackend
+from sorl.thumbnail.parsers import parse_geometry
+
+ENGINES = {
+    'pil': 'sorl.thumbnail.engines.pil_engine.Engine',
+    'draft': 'core.thumbnail_engine.Engine',
+}
+
+EXIF_ORIENTATION = 0x0112
+
+
+class Source:
+    def __init__(self, path):
+        self.name = path
+
+    def read(self):
+        with open(self.name, 'rb') as file_:
+            return file_.read()
+
+
+def make_image(path, size, image_format, orientation=None):
+    """Фотография-заглушка: плавные градиенты с шумом, как у снимка."""
+    noise = Image.effect_noise(size, 40)
+    channels = [
+        Image.linear_gradient('L').resize(size),
+        noise,
+        Image.radial_gradient('L').resize(size),
+    ]
+    image = Image.merge('RGB', channels)
+    params = {}
+    if image_format == 'JPEG':
+        params['quality'] = 90
+    if orientation is not None:
+        exif = Image.Exif()
+        exif[EXIF_ORIENTATION] = orientation
+        params['exif'] = exif.tobytes()
+    image.save(path, image_format, **params)
+
+
+def make_thumbnail(engine, source, geometry_string, options):
+    """То же, что делает sorl при создании миниатюры, без хранилищ."""
+    image = engine.get_image(source)
+    options = {**options, 'image_info': engine.get_image_info(image)}
+    ratio = engine.get_image_ratio(image, options)
+    geometry = parse_geometry(geometry_string, ratio)
+    thumbnail = engine.create(image, geometry, options)
+    data = engine._get_raw_data(
+        thumbnail, options['format'], options['quality'],
+        image_info=options['image_info'],
+    )
+    engine.cleanup(image)
+    return thumbnail.size, len(data)
+
+
+def peak_rss():
+    """Пик памяти процесса в КБ. В отличие от ru_maxrss, VmHWM не
+    наследует пик родительского процесса."""
+    try:
+        with open('/proc/self/status') as status:
+            for line in status:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def run_case(engine_path, path, geometry_string, options, repeat):
+    """Выполняется в отдельном процессе, чтобы мерить его пик памяти."""
+    engine = import_string(engine_path)()
+    source = Source(path)
+    baseline = peak_rss()
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        size, _ = make_thumbnail(engine, source, geometry_string, options)
+        timings.append(time.perf_counter() - started)
+    peak = peak_rss()
+    return statistics.median(timings) * 1000, (peak - baseline) / 1024, size
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает движок миниатюр проекта с движком PIL из sorl на '
+        'сгенерированных фотографиях: время и прирост пика памяти.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=3)
+        parser.add_argument(
+            '--megapixels', type=int, nargs='+', default=[2, 12, 24]
+        )
+
+    def get_corpus(self, directory, megapixels):
+        corpus = []
+        for mp in megapixels:
+            width = int((mp * 1000000 * 4 / 3) ** 0.5)
+            corpus.append(
+                (f'jpeg {mp} Мп', (width, width * 3 // 4), 'JPEG', None)
+            )
+        # Снимок, повёрнутый через EXIF, как их сохраняют телефоны.
+        name, size, _, _ = corpus[-1]
+        corpus.append((f'{name}, exif 6', size, 'JPEG', 6))
+        corpus.append(('png 4 Мп', (2000, 2000), 'PNG', None))
+        paths = []
+        for index, (name, size, image_format, orientation) in enumerate(
+            corpus
+        ):
+            path = os.path.join(directory, f'{index}.{image_format.lower()}')
+            make_image(path, size, image_format, orientation)
+            paths.append((name, path))
+        return paths
+
+    def handle(self, *args, **options):
+        geometry_string, thumbnail_options = settings.POST_THUMBNAILS[0]
+        thumbnail_options = {
+            **ThumbnailBackend.default_options, **thumbnail_options
+        }
+        directory = tempfile.mkdtemp()
+        context = multiprocessing.get_context('spawn')
+        self.stdout.write(f'Миниатюра {geometry_string}, {thumbnail_options}')
+        self.stdout.write(
+            f'{"image":<20} {"engine":<7} {"ms":>8} {"peak MB":>8} '
+            f'{"result":>10}'
+        )
+        try:
+            for name, path in self.get_corpus(
+                directory, options['megapixels']
+            ):
+                for engine, engine_path in ENGINES.items():
+                    with ProcessPoolExecutor(1, mp_context=context) as pool:
+                        milliseconds, peak, size = pool.submit(
+                            run_case, engine_path, path, geometry_string,
+                            thumbnail_options, options['repeat'],
+                        ).result()
+                    self.stdout.write(
+                        f'{name:<20} {engine:<7} {milliseconds:>8.1f} '
+                        f'{peak:>8.1f} {"x".join(map(str, size)):>10}'
+                    )
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
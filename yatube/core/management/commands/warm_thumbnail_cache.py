@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+from sorl.thumbnail import default
+
+
+class Command(BaseCommand):
+    help = (
+        'Загружает записи хранилища sorl-thumbnail из базы в кэш, чтобы '
+        'после очистки кэша ленты не проверяли миниатюры запросами к базе.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Сколько записей читать одним запросом.',
+        )
+
+    def handle(self, *args, **options):
+        total = 0
+        for count in default.kvstore.warm(options['batch_size']):
+            total += count
+            self.stdout.write(f'Загружено записей: {total}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Кэш миниатюр прогрет, записей: {total}'
+        ))
@@ -0,0 +1,77 @@
+"""Пересборка кэша одним процессом за раз.
+
+Значение хранится под постоянным ключом вместе с версией, поэтому после
+инвалидации в кэше остаётся предыдущая копия. Пересобирает значение
+только тот, кто взял блокировку; остальные в это время получают старую
+копию, а если её нет, недолго ждут новую.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+LOCK_KEY = 'lock:{}'
+WAIT_STEP = 0.05
+
+
+def get_lock_cache():
+    # Блокировка должна сразу быть видна всем процессам, поэтому её
+    # ставят мимо локального уровня TieredCache.
+    return getattr(cache, 'l2', cache)
+
+
+def acquire(key):
+    return get_lock_cache().add(
+        LOCK_KEY.format(key), True, settings.CACHE_LOCK_TIMEOUT
+    )
+
+
+def release(key):
+    get_lock_cache().delete(LOCK_KEY.format(key))
+
+
+def is_fresh(entry, version):
+    if entry is None:
+        return False
+    entry_version, value, fresh_until = entry
+    return entry_version == version and (
+        fresh_until is None or fresh_until > time.time()
+    )
+
+
+def wait_for(key, version):
+    deadline = time.monotonic() + settings.CACHE_LOCK_WAIT
+    while time.monotonic() < deadline:
+        time.sleep(WAIT_STEP)
+        entry = cache.get(key)
+        if entry is not None:
+            return entry
+    return None
+
+
+def get_or_set(key, version, build, timeout):
+    """Возвращает значение ключа, пересобирая его через build не более
+    чем в одном процессе одновременно."""
+    entry = cache.get(key)
+    if is_fresh(entry, version):
+        return entry[1]
+    locked = acquire(key)
+    if not locked:
+        if entry is None:
+            entry = wait_for(key, version)
+        if entry is not None:
+            return entry[1]
+    try:
+        value = build()
+        if timeout is None:
+            cache.set(key, (version, value, None), None)
+        else:
+            cache.set(
+                key,
+                (version, value, time.time() + timeout),
+                timeout + settings.CACHE_STALE_TIMEOUT,
+            )
+    finally:
+        if locked:
+            release(key)
+    return value
@@ -0,0 +1,27 @@
+from django import template
+
+register = template.Library()
+
+
+@register.filter
+def next_cursor(page):
+    return page.paginator.next_cursor(page)
+
+
+@register.filter
+def previous_cursor(page):
+    return page.paginator.previous_cursor(page)
+
+
+@register.filter
+def elided_page_range(page):
+    return page.paginator.get_elided_page_range(page.number)
+
+
+@register.filter
+def about_count(count):
+    """Округляет число до двух значащих цифр: 123456 -> «около 120 000»."""
+    digits = len(str(count)) - 2
+    if digits > 0:
+        count = round(count, -digits)
+    return 'около {:,}'.format(count).replace(',', '\u00a0')
@@ -0,0 +1,62 @@
+from django import template
+from django.core.cache.utils import make_template_fragment_key
+
+from core import stale_cache
+
+register = template.Library()
+
+
+class StaleCacheNode(template.Node):
+    def __init__(self, nodelist, expire_time, fragment_name, vary_on,
+                 version):
+        self.nodelist = nodelist
+        self.expire_time = expire_time
+        self.fragment_name = fragment_name
+        self.vary_on = vary_on
+        self.version = version
+
+    def render(self, context):
+        expire_time = self.expire_time.resolve(context)
+        if expire_time is not None:
+            try:
+                expire_time = int(expire_time)
+            except (ValueError, TypeError):
+                raise template.TemplateSyntaxError(
+                    f'"stalecache" tag got a non-integer timeout value: '
+                    f'{expire_time!r}'
+                )
+        key = make_template_fragment_key(
+            self.fragment_name,
+            [var.resolve(context) for var in self.vary_on],
+        )
+        return stale_cache.get_or_set(
+            key,
+            self.version.resolve(context),
+            lambda: self.nodelist.render(context),
+            expire_time,
+        )
+
+
+@register.tag('stalecache')
+def do_stale_cache(parser, token):
+    """Как {% cache %}, но с версией: после её смены фрагмент пересобирает
+    один запрос, а остальные получают предыдущую копию.
+
+        {% stalecache 500 sidebar request.user.pk version=feed_version %}
+            ...
+        {% endstalecache %}
+    """
+    nodelist = parser.parse(('endstalecache',))
+    parser.delete_first_token()
+    tokens = token.split_contents()
+    if len(tokens) < 4 or not tokens[-1].startswith('version='):
+        raise template.TemplateSyntaxError(
+            f'"{tokens[0]}" tag requires at least 2 arguments and version.'
+        )
+    return StaleCacheNode(
+        nodelist,
+        parser.compile_filter(tokens[1]),
+        tokens[2],
+        [parser.compile_filter(token) for token in tokens[3:-1]],
+        parser.compile_filter(tokens[-1][len('version='):]),
+    )
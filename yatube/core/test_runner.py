@@ -0,0 +1,45 @@
+"""Тесты на тех же кэшах, что и сайт, но во временном каталоге.
+
+Кэши SQLite из CACHES на время прогона переносятся во временные файлы:
+тесты проходят через общие для воркеров бэкенды и не трогают файлы
+кэша сайта.
+"""
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.test import override_settings
+from django.test.runner import DiscoverRunner
+
+SQLITE_BACKEND = 'core.cache_backends.sqlite.SQLiteCache'
+
+
+def temporary_caches(directory):
+    """CACHES, у которых файлы кэшей SQLite лежат в directory."""
+    caches = {}
+    for alias, params in settings.CACHES.items():
+        if params['BACKEND'] == SQLITE_BACKEND:
+            params = {
+                **params,
+                'LOCATION': os.path.join(
+                    directory, os.path.basename(params['LOCATION'])
+                ),
+            }
+        caches[alias] = params
+    return caches
+
+
+class TestRunner(DiscoverRunner):
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.cache_directory = tempfile.mkdtemp()
+        self.caches_override = override_settings(
+            CACHES=temporary_caches(self.cache_directory)
+        )
+        self.caches_override.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self.caches_override.disable()
+        shutil.rmtree(self.cache_directory, ignore_errors=True)
+        super().teardown_test_environment(**kwargs)
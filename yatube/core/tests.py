@@ -1,4 +1,21 @@
-from django.test import TestCase
+import os
+import shutil
+import tempfile
+import time
+from io import BytesIO
+
+from django.core.cache import cache, caches
+from django.conf import settings
+from django.test import TestCase, override_settings
+from PIL import Image
+from sorl.thumbnail.base import ThumbnailBackend
+from sorl.thumbnail.models import KVStore as KVStoreModel
+
+from . import stale_cache
+from .cache_backends.sqlite import SQLiteCache
+from .cache_backends.tiered import TieredCache
+from .thumbnail_engine import Engine
+from .thumbnail_kvstore import KVStore
 
 
 class ViewTestClass(TestCase):
@@ -6,3 +23,253 @@ class ViewTestClass(TestCase):
         response = self.client.get('/nonexist-page/')
         self.assertEqual(response.status_code, 404)
         self.assertTemplateUsed(response, 'core/404.html')
+
+
+class SQLiteCacheTests(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+        self.location = os.path.join(self.directory, 'cache.sqlite3')
+        self.cache = self.make_cache()
+
+    def make_cache(self, **options):
+        return SQLiteCache(self.location, {'OPTIONS': options})
+
+    def test_get_set_delete(self):
+        """Значения записываются, читаются и удаляются."""
+        self.cache.set('key', {'value': 1})
+        self.cache.set_many({'a': 1, 'b': 2})
+        self.assertEqual(self.cache.get('key'), {'value': 1})
+        self.assertEqual(
+            self.cache.get_many(['a', 'b', 'missing']), {'a': 1, 'b': 2}
+        )
+        self.cache.delete_many(['a', 'key'])
+        self.assertIsNone(self.cache.get('key'))
+        self.assertEqual(self.cache.get_many(['a', 'b']), {'b': 2})
+
+    def test_add(self):
+        """add не перезаписывает живое значение, но заменяет истёкшее."""
+        self.assertTrue(self.cache.add('key', 1))
+        self.assertFalse(self.cache.add('key', 2))
+        self.assertEqual(self.cache.get('key'), 1)
+        self.cache.set('expired', 1, timeout=0.01)
+        time.sleep(0.02)
+        self.assertTrue(self.cache.add('expired', 2))
+        self.assertEqual(self.cache.get('expired'), 2)
+
+    def test_timeout(self):
+        """Истёкшие значения не отдаются."""
+        self.cache.set('key', 1, timeout=0.01)
+        self.cache.set('forever', 1, timeout=None)
+        time.sleep(0.02)
+        self.assertFalse(self.cache.has_key('key'))
+        self.assertFalse(self.cache.touch('key'))
+        self.assertEqual(self.cache.get('forever'), 1)
+
+    def test_cull_removes_least_recently_used(self):
+        """При переполнении удаляются давно не читавшиеся записи."""
+        cache = self.make_cache(MAX_ENTRIES=10, CULL_FREQUENCY=2)
+        cache.set_many({f'old:{i}': i for i in range(10)})
+        cache.set_many({f'new:{i}': i for i in range(10)})
+        cache._cull()
+        self.assertEqual(cache.get_many([f'old:{i}' for i in range(10)]), {})
+        new_keys = [f'new:{i}' for i in range(10)]
+        self.assertEqual(len(cache.get_many(new_keys)), 10)
+
+    def test_instances_share_entries(self):
+        """Разные экземпляры на одном файле видят записи друг друга."""
+        other = self.make_cache()
+        self.cache.set('key', 1)
+        self.assertEqual(other.get('key'), 1)
+        other.delete('key')
+        self.assertIsNone(self.cache.get('key'))
+
+
+class TieredCacheTests(TestCase):
+    def setUp(self):
+        caches['l2'].clear()
+        self.worker = self.make_worker('worker-1')
+        self.other_worker = self.make_worker('worker-2')
+
+    def make_worker(self, name, **options):
+        options = {'L2': 'l2', 'L1_CHECK_INTERVAL': 0, **options}
+        worker = TieredCache(name, {'OPTIONS': options})
+        worker.l1.clear()
+        worker.l1.stats.clear()
+        return worker
+
+    def test_reads_are_served_from_l1(self):
+        """Повторное чтение не обращается к L2."""
+        self.other_worker.set('key', 'value')
+        self.assertEqual(self.worker.get('key'), 'value')
+        caches['l2'].delete('key')
+        self.assertEqual(self.worker.get('key'), 'value')
+        self.assertIsNone(self.worker.get('missing'))
+        self.assertEqual(
+            self.worker.stats(),
+            {'l1_hits': 1, 'l1_misses': 2, 'l2_hits': 1, 'l2_misses': 1},
+        )
+
+    def test_delete_invalidates_other_workers(self):
+        """Удаление ключа в одном процессе сбрасывает L1 остальных."""
+        self.worker.set('key', 'value')
+        self.assertEqual(self.worker.get('key'), 'value')
+        self.other_worker.delete('key')
+        self.assertIsNone(self.worker.get('key'))
+
+    def test_stamp_is_checked_once_per_interval(self):
+        """Метку версии процесс сверяет не чаще L1_CHECK_INTERVAL."""
+        worker = self.make_worker('worker-3', L1_CHECK_INTERVAL=60)
+        worker.set('key', 'value')
+        worker.get('key')
+        self.other_worker.delete('key')
+        self.assertEqual(worker.get('key'), 'value')
+        worker.l1.checked = 0
+        self.assertIsNone(worker.get('key'))
+
+    def test_mutable_values_are_copied(self):
+        """Изменение полученного объекта не портит значение в L1."""
+        self.worker.set('key', {'items': [1]})
+        self.worker.get('key')['items'].append(2)
+        self.assertEqual(self.worker.get('key'), {'items': [1]})
+
+    def test_l1_is_bounded(self):
+        """L1 вытесняет давно не читавшиеся ключи."""
+        worker = self.make_worker('worker-4', L1_MAX_ENTRIES=2)
+        worker.set('a', 1)
+        worker.set('b', 2)
+        worker.get('a')
+        worker.set('c', 3)
+        self.assertEqual(list(worker.l1.entries), [':1:a', ':1:c'])
+
+
+class StaleCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.builds = []
+
+    def build(self, value):
+        def build():
+            self.builds.append(value)
+            return value
+        return build
+
+    def test_fresh_value_is_not_rebuilt(self):
+        """Актуальное значение отдаётся без пересборки."""
+        stale_cache.get_or_set('key', 'v1', self.build('old'), 60)
+        value = stale_cache.get_or_set('key', 'v1', self.build('new'), 60)
+        self.assertEqual(value, 'old')
+        self.assertEqual(self.builds, ['old'])
+
+    def test_stale_value_is_served_while_locked(self):
+        """Пока ключ пересобирает другой процесс, отдаётся старая копия."""
+        stale_cache.get_or_set('key', 'v1', self.build('old'), 60)
+        self.assertTrue(stale_cache.acquire('key'))
+        value = stale_cache.get_or_set('key', 'v2', self.build('new'), 60)
+        self.assertEqual(value, 'old')
+        stale_cache.release('key')
+        value = stale_cache.get_or_set('key', 'v2', self.build('new'), 60)
+        self.assertEqual(value, 'new')
+        self.assertEqual(self.builds, ['old', 'new'])
+        self.assertTrue(stale_cache.acquire('key'))
+
+    @override_settings(CACHE_LOCK_WAIT=0)
+    def test_missing_value_is_built_after_wait(self):
+        """Без старой копии значение собирается после ожидания."""
+        stale_cache.acquire('key')
+        value = stale_cache.get_or_set('key', 'v1', self.build('new'), 60)
+        self.assertEqual(value, 'new')
+        self.assertFalse(stale_cache.acquire('key'))
+
+
+class ThumbnailKVStoreTests(TestCase):
+    def setUp(self):
+        # Хранилище миниатюр на SQLite, как на сайте, но во временном файле.
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        override = override_settings(CACHES={
+            **settings.CACHES,
+            'shared': {
+                **settings.SHARED_CACHE,
+                'LOCATION': os.path.join(directory, 'cache.sqlite3'),
+            },
+        })
+        override.enable()
+        self.addCleanup(override.disable)
+        self.cache = caches[settings.THUMBNAIL_CACHE]
+        self.cache.clear()
+        self.store = KVStore()
+
+    def test_values_are_read_from_cache(self):
+        """Повторная проверка миниатюры не обращается к базе."""
+        KVStoreModel.objects.create(key='sorl-thumbnail||image||a', value='1')
+        self.assertEqual(self.store._get_raw('sorl-thumbnail||image||a'), '1')
+        with self.assertNumQueries(0):
+            self.assertEqual(
+                self.store._get_raw('sorl-thumbnail||image||a'), '1'
+            )
+
+    @override_settings(THUMBNAIL_MISS_TIMEOUT=0.01)
+    def test_misses_expire(self):
+        """Отсутствие миниатюры кэшируется лишь на THUMBNAIL_MISS_TIMEOUT."""
+        key = 'sorl-thumbnail||image||missing'
+        self.assertIsNone(self.store._get_raw(key))
+        KVStoreModel.objects.create(key=key, value='1')
+        with self.assertNumQueries(0):
+            self.assertIsNone(self.store._get_raw(key))
+        time.sleep(0.02)
+        self.assertEqual(self.store._get_raw(key), '1')
+
+    def test_warm(self):
+        """Прогрев переносит записи из базы в кэш пачками."""
+        KVStoreModel.objects.bulk_create([
+            KVStoreModel(key=f'sorl-thumbnail||image||{i}', value=str(i))
+            for i in range(3)
+        ])
+        self.assertEqual(list(self.store.warm(2)), [2, 1])
+        with self.assertNumQueries(0):
+            self.assertEqual(
+                self.store._get_raw('sorl-thumbnail||image||2'), '2'
+            )
+
+
+class JPEGSource:
+    name = 'photo.jpg'
+
+    def __init__(self, size):
+        buffer = BytesIO()
+        Image.new('RGB', size, 'red').save(buffer, 'JPEG')
+        self.data = buffer.getvalue()
+
+    def read(self):
+        return self.data
+
+
+class ThumbnailEngineTests(TestCase):
+    def setUp(self):
+        self.engine = Engine()
+        self.options = {
+            **ThumbnailBackend.default_options,
+            'crop': 'center',
+            'upscale': True,
+        }
+
+    def test_jpeg_is_decoded_reduced(self):
+        """JPEG декодируется уменьшенным, но не меньше миниатюры."""
+        image = self.engine.get_image(JPEGSource((2000, 1500)))
+        self.engine.draft(image, (960, 339), self.options)
+        self.assertEqual(image.size, (1000, 750))
+        thumbnail = self.engine.create(image, (960, 339), self.options)
+        self.assertEqual(thumbnail.size, (960, 339))
+
+    def test_small_jpeg_is_not_reduced(self):
+        """Картинку меньше миниатюры draft mode не уменьшает."""
+        image = self.engine.get_image(JPEGSource((800, 600)))
+        self.engine.draft(image, (960, 339), self.options)
+        self.assertEqual(image.size, (800, 600))
+
+    @override_settings(THUMBNAIL_MAX_PIXELS=1000)
+    def test_large_images_are_refused(self):
+        """Картинки больше THUMBNAIL_MAX_PIXELS не открываются."""
+        with self.assertRaises(Image.DecompressionBombError):
+            self.engine.get_image(JPEGSource((100, 100)))
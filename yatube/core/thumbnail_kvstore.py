@@ -0,0 +1,49 @@
+"""Хранилище ключей sorl-thumbnail: кэш перед таблицей thumbnail_kvstore.
+
+sorl проверяет по хранилищу, есть ли миниатюра, при каждой отрисовке
+картинки. Значения читаются из кэша THUMBNAIL_CACHE и только при промахе
+из базы. Этот кэш общий для сайта и процессов пула миниатюр, так что
+записанное воркером видно всем без запроса к базе.
+
+В отличие от хранилища sorl, отсутствие миниатюры запоминается лишь на
+THUMBNAIL_MISS_TIMEOUT секунд: иначе процесс, не заметивший созданную
+другим процессом миниатюру, показывал бы заглушку годами.
+"""
+from django.conf import settings
+from sorl.thumbnail.conf import settings as thumbnail_settings
+from sorl.thumbnail.kvstores import cached_db_kvstore
+from sorl.thumbnail.models import KVStore as KVStoreModel
+
+MISSING = ''
+
+
+class KVStore(cached_db_kvstore.KVStore):
+    def _get_raw(self, key):
+        value = self.cache.get(key)
+        if value is None:
+            value = KVStoreModel.objects.filter(key=key).values_list(
+                'value', flat=True
+            ).first()
+            if value is None:
+                self.cache.set(key, MISSING, settings.THUMBNAIL_MISS_TIMEOUT)
+            else:
+                self.cache.set(
+                    key, value, thumbnail_settings.THUMBNAIL_CACHE_TIMEOUT
+                )
+        return value or None
+
+    def warm(self, batch_size):
+        """Копирует записи из базы в кэш пачками; отдаёт размер пачек."""
+        rows = KVStoreModel.objects.filter(
+            key__startswith=thumbnail_settings.THUMBNAIL_KEY_PREFIX
+        ).order_by('key').values_list('key', 'value')
+        last_key = ''
+        while True:
+            batch = dict(rows.filter(key__gt=last_key)[:batch_size])
+            if not batch:
+                return
+            self.cache.set_many(
+                batch, thumbnail_settings.THUMBNAIL_CACHE_TIMEOUT
+            )
+            last_key = max(batch)
+            yield len(batch)
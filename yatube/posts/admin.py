@@ -1,35 +1,224 @@
-from django.contrib import admin
+import logging
 
-from .models import Comment, Follow, Group, Post
+from django import forms
+from django.conf import settings
+from django.contrib import admin, messages
+from django.contrib.admin.helpers import ActionForm
+from django.contrib.auth.admin import UserAdmin
+
+from . import bulk, deletion, search
+from .models import Comment, Follow, Group, Post, User
+
+logger = logging.getLogger(__name__)
+
+
+def run_bulk(modeladmin, request, batches, message):
+    """Выполняет массовую операцию, записывая прогресс в лог после
+    каждой пачки."""
+    total = 0
+    for number, count in enumerate(batches, 1):
+        total += count
+        logger.info('%s: пачка %d, всего %d', message, number, total)
+    modeladmin.message_user(request, f'{message}: {total}')
+
+
+class PostActionForm(ActionForm):
+    group = forms.ModelChoiceField(
+        Group.objects.all(),
+        required=False,
+        label='Группа',
+        empty_label='без группы',
+    )
+
+
+class UsernameFilter(admin.SimpleListFilter):
+    """Фильтр по имени пользователя в виде поля ввода: список всех
+    пользователей в боковой панели на больших таблицах не отрисовать."""
+
+    template = 'admin/input_filter.html'
+    field_name = None
+
+    def lookups(self, request, model_admin):
+        return ()
+
+    def has_output(self):
+        return True
+
+    def queryset(self, request, queryset):
+        if self.value():
+            return queryset.filter(
+                **{f'{self.field_name}__username': self.value()}
+            )
+        return queryset
+
+    def choices(self, changelist):
+        yield {
+            'selected': self.value() is None,
+            'query_string': changelist.get_query_string(
+                remove=[self.parameter_name]
+            ),
+            'query_parts': [
+                (key, value) for key, value in changelist.params.items()
+                if key not in (self.parameter_name, 'p')
+            ],
+        }
+
+
+class FollowerFilter(UsernameFilter):
+    title = 'подписчику'
+    parameter_name = 'user'
+    field_name = 'user'
+
+
+class AuthorFilter(UsernameFilter):
+    title = 'автору'
+    parameter_name = 'author'
+    field_name = 'author'
 
 
 class PostAdmin(admin.ModelAdmin):
     list_display = ('pk', 'text', 'pub_date', 'author', 'group')
+    list_select_related = ('author', 'group')
     search_fields = ('text',)
     list_filter = ('pub_date',)
+    date_hierarchy = 'pub_date'
+    autocomplete_fields = ('author', 'group')
+    show_full_result_count = False
     empty_value_display = '-пусто-'
+    action_form = PostActionForm
+    actions = ('move_to_group', 'delete_in_bulk', 'purge_authors')
+
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term:
+            return queryset, False
+        return search.filter_posts(queryset, search_term), False
+
+    def move_to_group(self, request, queryset):
+        form = PostActionForm(request.POST)
+        # Без вариантов action форма не проходит проверку, и группа
+        # молча превращалась бы в «без группы».
+        form.fields['action'].choices = self.get_action_choices(request)
+        if not form.is_valid():
+            self.message_user(
+                request, 'Выберите существующую группу.', messages.ERROR
+            )
+            return
+        group = form.cleaned_data['group']
+        run_bulk(
+            self,
+            request,
+            bulk.move_posts(queryset, group, settings.BULK_BATCH_SIZE),
+            f'Перенесено в «{group or "без группы"}»',
+        )
+    move_to_group.short_description = 'Перенести в выбранную группу'
+
+    def delete_in_bulk(self, request, queryset):
+        run_bulk(
+            self,
+            request,
+            bulk.delete_posts(queryset, settings.BULK_BATCH_SIZE),
+            'Удалено постов',
+        )
+    delete_in_bulk.short_description = 'Удалить выбранные посты пачками'
+
+    def purge_authors(self, request, queryset):
+        author_ids = set(queryset.values_list('author_id', flat=True))
+        run_bulk(
+            self,
+            request,
+            bulk.purge_authors(author_ids, settings.BULK_BATCH_SIZE),
+            'Удалено постов и комментариев',
+        )
+    purge_authors.short_description = (
+        'Удалить все посты и комментарии авторов выбранных постов'
+    )
 
 
 class GroupAdmin(admin.ModelAdmin):
     list_display = ('pk', 'title', 'slug', 'description')
-    search_fields = ('description',)
+    search_fields = ('title', 'slug', 'description')
     empty_value_display = '-пусто-'
 
 
 class CommentAdmin(admin.ModelAdmin):
     list_display = ('pk', 'post', 'author', 'text', 'created')
+    list_select_related = ('post', 'author')
     search_fields = ('text',)
     list_filter = ('created',)
+    autocomplete_fields = ('post', 'author')
+    show_full_result_count = False
     empty_value_display = '-пусто-'
+    actions = ('delete_in_bulk', 'delete_by_authors')
+
+    def delete_in_bulk(self, request, queryset):
+        run_bulk(
+            self,
+            request,
+            bulk.delete_comments(queryset, settings.BULK_BATCH_SIZE),
+            'Удалено комментариев',
+        )
+    delete_in_bulk.short_description = (
+        'Удалить выбранные комментарии пачками'
+    )
+
+    def delete_by_authors(self, request, queryset):
+        author_ids = set(queryset.values_list('author_id', flat=True))
+        run_bulk(
+            self,
+            request,
+            bulk.delete_comments(
+                Comment.objects.filter(author_id__in=author_ids),
+                settings.BULK_BATCH_SIZE,
+            ),
+            'Удалено комментариев',
+        )
+    delete_by_authors.short_description = (
+        'Удалить все комментарии авторов выбранных комментариев'
+    )
 
 
 class FollowAdmin(admin.ModelAdmin):
     list_display = ('pk', 'user', 'author')
-    list_filter = ('user',)
+    list_select_related = ('user', 'author')
+    list_filter = (FollowerFilter, AuthorFilter)
+    autocomplete_fields = ('user', 'author')
+    show_full_result_count = False
     empty_value_display = '-пусто-'
+    actions = ('delete_in_bulk',)
+
+    def delete_in_bulk(self, request, queryset):
+        run_bulk(
+            self,
+            request,
+            bulk.delete_follows(queryset, settings.BULK_BATCH_SIZE),
+            'Удалено подписок',
+        )
+    delete_in_bulk.short_description = 'Удалить выбранные подписки пачками'
+
+
+class SoftDeleteUserAdmin(UserAdmin):
+    """Удаление пользователя только скрывает его записи, а сами записи
+    удаляет в фоне команда process_deletions."""
+
+    def get_deleted_objects(self, objs, request):
+        # Сборщик связанных объектов обходит всю историю пользователя,
+        # а она удаляется не здесь.
+        perms_needed = set()
+        if not self.has_delete_permission(request):
+            perms_needed.add(self.opts.verbose_name)
+        return [str(obj) for obj in objs], {}, perms_needed, []
+
+    def delete_model(self, request, obj):
+        deletion.soft_delete(obj)
+
+    def delete_queryset(self, request, queryset):
+        for user in queryset:
+            deletion.soft_delete(user)
 
 
 admin.site.register(Post, PostAdmin)
 admin.site.register(Group, GroupAdmin)
 admin.site.register(Comment, CommentAdmin)
 admin.site.register(Follow, FollowAdmin)
+admin.site.unregister(User)
+admin.site.register(User, SoftDeleteUserAdmin)
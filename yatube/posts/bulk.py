@@ -0,0 +1,148 @@
+"""Массовые операции модерации.
+
+Операции идут пачками по BULK_BATCH_SIZE id: каждая пачка — несколько
+UPDATE/DELETE в одной транзакции, без загрузки объектов целиком и без
+сигналов на каждую строку. То, что при обычном сохранении делают
+сигналы — счётчики, поисковый индекс, списки id, кэш объектов и версии
+лент, — здесь делается один раз на пачку.
+
+Функции — генераторы: после каждой пачки они отдают число обработанных
+в ней строк, так что вызывающий код может показывать прогресс.
+"""
+from collections import Counter, defaultdict
+
+from django.db import transaction
+from django.utils import timezone
+from sorl.thumbnail import delete as delete_image
+
+from . import counters, feed_cache, id_cache, object_cache, search
+from .models import Comment, Follow, Post, TimelineEntry
+
+POST_FIELDS = ('author_id', 'group_id', 'pub_date')
+
+
+def raw_delete(queryset):
+    # QuerySet.delete() у моделей с обработчиками сигналов загружает
+    # каждую строку и рассылает сигналы; _raw_delete — тот же DELETE, что
+    # Django выполняет для моделей без сигналов.
+    return queryset._raw_delete(queryset.db)
+
+
+def by_feed(posts, get_feeds):
+    feed_posts = defaultdict(list)
+    for post in posts:
+        for feed in get_feeds(post):
+            feed_posts[feed].append(post)
+    return feed_posts
+
+
+def group_feeds(post):
+    if post.group_id is None:
+        return []
+    return [feed_cache.group_feed(post.group_id)]
+
+
+def move_posts(queryset, group, batch_size):
+    for pks in counters.batches(queryset, batch_size):
+        with transaction.atomic():
+            posts = list(Post.objects.filter(pk__in=pks).exclude(
+                group=group
+            ).only(*POST_FIELDS))
+            Post.objects.filter(pk__in=[post.pk for post in posts]).update(
+                group=group, updated=timezone.now()
+            )
+        id_cache.remove_posts(by_feed(posts, group_feeds))
+        previous_group_ids = {post.group_id for post in posts}
+        for post in posts:
+            post.group = group
+        id_cache.add_posts(by_feed(posts, group_feeds))
+        object_cache.forget_posts(pks)
+        feed_cache.bump(*feed_cache.post_feeds(posts, previous_group_ids))
+        yield len(posts)
+
+
+def delete_posts(queryset, batch_size, delete_files=False, hidden=False):
+    """С delete_files удаляет и картинки постов вместе с миниатюрами —
+    до строк, чтобы после сбоя не оставалось файлов без постов.
+
+    hidden — посты скрытого автора: списки id, собранные после скрытия,
+    их уже не считают, поэтому такие списки сбрасываются, а не
+    уменьшаются."""
+    for pks in counters.batches(queryset, batch_size):
+        with transaction.atomic():
+            posts = list(Post.objects.filter(pk__in=pks).only(
+                *POST_FIELDS, 'image'
+            ))
+            if delete_files:
+                for post in posts:
+                    if post.image:
+                        delete_image(post.image)
+            feeds = feed_cache.post_feeds(posts)
+            raw_delete(Comment.objects.filter(post_id__in=pks))
+            raw_delete(TimelineEntry.objects.filter(post_id__in=pks))
+            raw_delete(Post.objects.filter(pk__in=pks))
+            search.unindex_posts(pks)
+            authors = Counter(post.author_id for post in posts)
+            for author_id, count in authors.items():
+                counters.change_user(author_id, posts_count=-count)
+        if hidden:
+            id_cache.forget(by_feed(posts, id_cache.get_feeds))
+        else:
+            id_cache.remove_posts(by_feed(posts, id_cache.get_feeds))
+        object_cache.forget_posts(pks)
+        feed_cache.bump(*feeds)
+        yield len(posts)
+
+
+def delete_comments(queryset, batch_size):
+    for pks in counters.batches(queryset, batch_size):
+        with transaction.atomic():
+            post_ids = Counter(Comment.objects.filter(
+                pk__in=pks
+            ).values_list('post_id', flat=True))
+            raw_delete(Comment.objects.filter(pk__in=pks))
+            for post_id, count in post_ids.items():
+                counters.change_post(post_id, -count)
+        posts = Post.objects.filter(pk__in=post_ids).only(*POST_FIELDS)
+        feed_cache.bump(*feed_cache.post_feeds(list(posts)))
+        yield sum(post_ids.values())
+
+
+def delete_follows(queryset, batch_size):
+    for pks in counters.batches(queryset, batch_size):
+        with transaction.atomic():
+            follows = list(
+                Follow.objects.filter(pk__in=pks).values_list(
+                    'user_id', 'author_id'
+                )
+            )
+            raw_delete(Follow.objects.filter(pk__in=pks))
+            authors_by_user = defaultdict(list)
+            for user_id, author_id in follows:
+                authors_by_user[user_id].append(author_id)
+            for user_id, author_ids in authors_by_user.items():
+                TimelineEntry.objects.filter(
+                    user_id=user_id, author_id__in=author_ids
+                ).delete()
+                counters.change_user(
+                    user_id, following_count=-len(author_ids)
+                )
+            followers = Counter(author_id for _, author_id in follows)
+            for author_id, count in followers.items():
+                counters.change_user(author_id, followers_count=-count)
+        feed_cache.bump(
+            *(feed_cache.follow_feed(user_id) for user_id in authors_by_user),
+            *(feed_cache.profile_feed(user_id) for user_id in authors_by_user),
+            *(feed_cache.profile_feed(author_id) for author_id in followers),
+        )
+        yield len(follows)
+
+
+def purge_authors(author_ids, batch_size):
+    """Удаляет все посты и комментарии авторов."""
+    yield from delete_comments(
+        Comment.objects.filter(author_id__in=author_ids), batch_size
+    )
+    yield from delete_posts(
+        Post.objects.filter(author_id__in=author_ids), batch_size
+    )
@@ -0,0 +1,111 @@
+"""Счётчики постов, комментариев и подписок.
+
+Сигналы меняют счётчики атомарно через F(), без пересчёта агрегатов.
+Если счётчики разошлись с данными (например, после массовых операций
+мимо сигналов), их пересчитывает команда reconcile_counters.
+"""
+from django.db import transaction
+from django.db.models import Count, F
+from django.utils import timezone
+
+from . import object_cache
+from .models import Comment, Follow, Post, User, UserCounters
+
+USER_FIELDS = ('posts_count', 'followers_count', 'following_count')
+
+
+def change_user(user_id, **deltas):
+    changes = {field: F(field) + delta for field, delta in deltas.items()}
+    updated = UserCounters.objects.filter(user_id=user_id).update(**changes)
+    # Строки нет только у пользователей, заведённых мимо сигналов, или у
+    # удаляемого пользователя: создавать её при уменьшении нельзя.
+    if not updated and max(deltas.values()) > 0:
+        UserCounters.objects.get_or_create(user_id=user_id)
+        UserCounters.objects.filter(user_id=user_id).update(**changes)
+    object_cache.forget_user(user_id)
+
+
+def change_post(post_id, delta):
+    Post.objects.filter(pk=post_id).update(
+        comments_count=F('comments_count') + delta,
+        updated=timezone.now(),
+    )
+    object_cache.forget_posts([post_id])
+
+
+def get_user_counters(user):
+    try:
+        return user.counters
+    except UserCounters.DoesNotExist:
+        return UserCounters(user=user)
+
+
+def count_by(queryset, field):
+    return dict(queryset.values_list(field).annotate(Count('pk')))
+
+
+def batches(queryset, batch_size):
+    last_pk = 0
+    while True:
+        pks = list(queryset.filter(pk__gt=last_pk).order_by(
+            'pk'
+        ).values_list('pk', flat=True)[:batch_size])
+        if not pks:
+            return
+        yield pks
+        last_pk = pks[-1]
+
+
+def reconcile_users(pks):
+    with transaction.atomic():
+        posts = count_by(Post.objects.filter(author_id__in=pks), 'author')
+        followers = count_by(
+            Follow.objects.filter(author_id__in=pks), 'author'
+        )
+        following = count_by(Follow.objects.filter(user_id__in=pks), 'user')
+        UserCounters.objects.bulk_create(
+            [UserCounters(user_id=pk) for pk in pks],
+            ignore_conflicts=True,
+        )
+        stale = []
+        for counters in UserCounters.objects.filter(user_id__in=pks):
+            actual = (
+                posts.get(counters.user_id, 0),
+                followers.get(counters.user_id, 0),
+                following.get(counters.user_id, 0),
+            )
+            current = tuple(getattr(counters, field) for field in USER_FIELDS)
+            if current != actual:
+                for field, value in zip(USER_FIELDS, actual):
+                    setattr(counters, field, value)
+                stale.append(counters)
+        UserCounters.objects.bulk_update(stale, USER_FIELDS)
+    return len(stale)
+
+
+def reconcile_posts(pks):
+    with transaction.atomic():
+        comments = count_by(Comment.objects.filter(post_id__in=pks), 'post')
+        stale = []
+        for post in Post.objects.filter(pk__in=pks).only('comments_count'):
+            actual = comments.get(post.pk, 0)
+            if post.comments_count != actual:
+                post.comments_count = actual
+                stale.append(post)
+        for post in stale:
+            post.updated = timezone.now()
+        Post.objects.bulk_update(stale, ['comments_count', 'updated'])
+    object_cache.forget_posts([post.pk for post in stale])
+    return len(stale)
+
+
+def reconcile(batch_size):
+    """Пересчитывает счётчики пачками по batch_size объектов и возвращает
+    число исправленных (пользователей, постов)."""
+    users = sum(
+        reconcile_users(pks) for pks in batches(User.objects, batch_size)
+    )
+    posts = sum(
+        reconcile_posts(pks) for pks in batches(Post.objects, batch_size)
+    )
+    return users, posts
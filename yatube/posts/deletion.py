@@ -0,0 +1,70 @@
+"""Удаление пользователей в фоне.
+
+Каскадное удаление автора с большой историей надолго блокирует SQLite,
+поэтому оно идёт в два шага. soft_delete() сразу скрывает пользователя:
+записывает UserDeletion, запрещает вход и сбрасывает кэши лент, в
+которых он показывался. Затем команда process_deletions пачками удаляет
+его комментарии, посты с картинками, подписки и ленту, а в конце —
+самого пользователя. Каждая пачка — отдельная транзакция, так что после
+сбоя команду достаточно запустить снова.
+"""
+from django.db import transaction
+from django.db.models import Q
+
+from . import bulk, counters, feed_cache, hidden, id_cache, object_cache
+from .models import Comment, Follow, Post, TimelineEntry, User, UserDeletion
+
+
+def soft_delete(user):
+    with transaction.atomic():
+        UserDeletion.objects.get_or_create(user=user)
+        User.objects.filter(pk=user.pk).update(is_active=False)
+    hidden.forget()
+    object_cache.forget_user(user.pk)
+    feeds = feed_cache.author_feeds(user.pk)
+    # Списки id пересоберутся запросами, которые уже исключают автора.
+    id_cache.forget(feeds)
+    commented = Comment.objects.filter(author=user).values_list(
+        'post_id', flat=True
+    ).distinct()
+    feed_cache.bump(
+        *feeds,
+        *feed_cache.follower_feeds(user.pk),
+        *(feed_cache.post_page(post_id) for post_id in commented),
+    )
+
+
+def delete_timeline(user_id, batch_size):
+    for pks in counters.batches(
+        TimelineEntry.objects.filter(user_id=user_id), batch_size
+    ):
+        TimelineEntry.objects.filter(pk__in=pks).delete()
+        yield len(pks)
+
+
+def process(user_id, batch_size):
+    """Удаляет данные пользователя пачками; отдаёт число строк в каждой."""
+    yield from bulk.delete_comments(
+        Comment.objects.filter(author_id=user_id), batch_size
+    )
+    yield from bulk.delete_posts(
+        Post.objects.filter(author_id=user_id),
+        batch_size,
+        delete_files=True,
+        hidden=True,
+    )
+    yield from bulk.delete_follows(
+        Follow.objects.filter(Q(user_id=user_id) | Q(author_id=user_id)),
+        batch_size,
+    )
+    yield from delete_timeline(user_id, batch_size)
+    user = User.objects.filter(pk=user_id).first()
+    if user is not None:
+        user.delete()
+    hidden.forget()
+
+
+def pending():
+    return list(UserDeletion.objects.order_by('created').values_list(
+        'user_id', flat=True
+    ))
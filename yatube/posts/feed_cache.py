@@ -0,0 +1,108 @@
+"""Версии лент для кэша фрагментов и страниц.
+
+У каждой ленты есть версия в кэше. Фрагмент хранится вместе с версиями
+всех лент, от которых он зависит, поэтому для инвалидации достаточно
+удалить версию: следующий запрос получит новую и пересоберёт фрагмент.
+"""
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import Follow, Post, PulledAuthor
+
+VERSION_KEY = 'feed_version:{}'
+
+INDEX = 'index'
+GROUPS = 'groups'
+
+
+def group_feed(group_id):
+    return f'group:{group_id}'
+
+
+def profile_feed(author_id):
+    return f'profile:{author_id}'
+
+
+def follow_feed(user_id):
+    return f'follow:{user_id}'
+
+
+def post_page(post_id):
+    return f'post:{post_id}'
+
+
+def post_feeds(posts, extra_group_ids=()):
+    """Ленты, в которых показываются посты: общая, профили авторов,
+    группы, страницы постов и ленты подписчиков авторов, чьи посты
+    раскладываются по подпискам."""
+    author_ids = {post.author_id for post in posts}
+    group_ids = {post.group_id for post in posts} | set(extra_group_ids)
+    followers = Follow.objects.filter(author_id__in=author_ids).exclude(
+        author__in=PulledAuthor.objects.values('author')
+    ).values_list('user_id', flat=True).distinct()
+    return [
+        INDEX,
+        *(profile_feed(author_id) for author_id in author_ids),
+        *(post_page(post.pk) for post in posts),
+        *(group_feed(group_id) for group_id in group_ids
+          if group_id is not None),
+        *(follow_feed(user_id) for user_id in followers),
+    ]
+
+
+def author_feeds(author_id):
+    """Общая лента, профиль и группы, в которых есть посты автора."""
+    group_ids = Post.objects.filter(author_id=author_id).exclude(
+        group=None
+    ).values_list('group_id', flat=True).distinct()
+    return [
+        INDEX,
+        profile_feed(author_id),
+        *(group_feed(group_id) for group_id in group_ids),
+    ]
+
+
+def follower_feeds(author_id):
+    """Ленты подписчиков автора. Ленты подписчиков автора, читаемого
+    через pull, зависят от версии его профиля."""
+    followers = Follow.objects.filter(author_id=author_id).exclude(
+        author__in=PulledAuthor.objects.values('author')
+    ).values_list('user_id', flat=True)
+    return [follow_feed(user_id) for user_id in followers]
+
+
+def get_versions(feeds):
+    keys = [VERSION_KEY.format(feed) for feed in feeds]
+    versions = cache.get_many(keys)
+    missing = [key for key in keys if key not in versions]
+    if missing:
+        for key in missing:
+            cache.add(key, uuid.uuid4().hex, timeout=None)
+        versions.update(cache.get_many(missing))
+    return [versions.get(key, '') for key in keys]
+
+
+def add_tags(request, *feeds):
+    """Запоминает в запросе версии лент, от которых зависит страница."""
+    versions = get_versions(feeds)
+    if not hasattr(request, 'cache_tags'):
+        request.cache_tags = {}
+    request.cache_tags.update(zip(feeds, versions))
+    return versions
+
+
+def bump(*feeds):
+    cache.delete_many([VERSION_KEY.format(feed) for feed in feeds])
+
+
+def get_cache_context(request, *feeds):
+    feeds = (GROUPS,) + feeds
+    page = request.GET.get('cursor') or request.GET.get('page') or '1'
+    return {
+        'feed_cache_key': ':'.join(feeds),
+        'feed_cache_version': ':'.join(add_tags(request, *feeds)),
+        'feed_cache_page': page,
+        'feed_cache_timeout': settings.FEED_CACHE_TIMEOUT,
+    }
@@ -1,5 +1,8 @@
 from django import forms
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
 
+from . import images
 from .models import Comment, Post
 
 
@@ -13,6 +16,23 @@ class PostForm(forms.ModelForm):
             'image': 'картинка'
         }
 
+    # Поля, которые меняет редактирование: поля формы, сведения о
+    # картинке и дата изменения.
+    UPDATE_FIELDS = (*Meta.fields, *images.FIELDS, 'updated')
+
+    def clean_image(self):
+        image = self.cleaned_data['image']
+        if not isinstance(image, UploadedFile):
+            return image
+        # Размер ImageField уже прочитал из заголовка при проверке файла.
+        width, height = image.image.size
+        if width * height > settings.THUMBNAIL_MAX_PIXELS:
+            raise forms.ValidationError(
+                'Картинка слишком большая: не больше %(limit)s пикселей.',
+                params={'limit': settings.THUMBNAIL_MAX_PIXELS},
+            )
+        return images.normalize(image)
+
 
 class CommentForm(forms.ModelForm):
     class Meta:
@@ -0,0 +1,31 @@
+"""Авторы, чьи записи скрыты до фонового удаления.
+
+Множество их id небольшое и хранится в кэше целиком: ленты исключают
+этих авторов прямо в запросе, а посты из кэша отбрасываются при чтении.
+"""
+from django.core.cache import cache
+
+from .models import UserDeletion
+
+KEY = 'hidden_authors'
+
+
+def get_ids():
+    ids = cache.get(KEY)
+    if ids is None:
+        ids = frozenset(
+            UserDeletion.objects.values_list('user_id', flat=True)
+        )
+        cache.set(KEY, ids, None)
+    return ids
+
+
+def visible(queryset, field='author_id'):
+    ids = get_ids()
+    if not ids:
+        return queryset
+    return queryset.exclude(**{f'{field}__in': ids})
+
+
+def forget():
+    cache.delete(KEY)
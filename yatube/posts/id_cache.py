@@ -0,0 +1,200 @@
+"""Кэш списков id постов для лент.
+
+Для каждой ленты хранится начало: до FEED_ID_CACHE_LENGTH ключей
+(pub_date, pk) в порядке убывания и общее число постов в ней. Сигналы
+Post вставляют и удаляют в этих списках по одному посту, поэтому
+изменение поста не сбрасывает ленты целиком. Страницы, которые выходят
+за начало ленты, читаются из базы как раньше.
+
+Список меняет только тот, кто взял блокировку ключа, и читает его при
+этом мимо локального уровня TieredCache: копия в L1 другого процесса
+может быть старше последнего изменения. Если блокировка занята, лента
+помечается изменённой: держатель блокировки, собирающий или меняющий
+список, не сохраняет его, и список собирается заново при следующем
+чтении.
+"""
+from array import array
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from core import stale_cache
+
+from . import feed_cache
+
+KEY = 'feed_ids:{}'
+DIRTY_KEY = 'feed_ids_dirty:{}'
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+MICROSECOND = timedelta(microseconds=1)
+
+
+def to_key(pub_date, pk):
+    return (pub_date - EPOCH) // MICROSECOND, pk
+
+
+class FeedIds:
+    def __init__(self, rows, count):
+        self.dates = array('q')
+        self.ids = array('q')
+        for pub_date, pk in rows:
+            self.dates.append(to_key(pub_date, pk)[0])
+            self.ids.append(pk)
+        self.count = count
+
+    def __len__(self):
+        return len(self.ids)
+
+    @property
+    def complete(self):
+        return len(self.ids) >= self.count
+
+    def bisect(self, key, inclusive=False):
+        """Индекс первого ключа меньше key (или равного, если inclusive)."""
+        low, high = 0, len(self.ids)
+        while low < high:
+            middle = (low + high) // 2
+            current = (self.dates[middle], self.ids[middle])
+            if current > key or (current == key and not inclusive):
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def slice(self, start, stop):
+        """id с позиций [start, stop) или None, если их нет в списке."""
+        if stop <= len(self.ids) or self.complete:
+            return list(self.ids[start:stop])
+        return None
+
+    def seek_next(self, key, limit):
+        start = self.bisect(key)
+        return self.slice(start, start + limit)
+
+    def seek_previous(self, key, limit):
+        stop = self.bisect(key, inclusive=True)
+        if stop == len(self.ids) and not self.complete:
+            return None
+        return list(reversed(self.ids[max(stop - limit, 0):stop]))
+
+    def insert(self, key, limit):
+        position = self.bisect(key)
+        complete = self.complete
+        self.count += 1
+        if position == len(self.ids) and not complete:
+            return
+        self.dates.insert(position, key[0])
+        self.ids.insert(position, key[1])
+        if len(self.ids) > limit:
+            self.dates.pop()
+            self.ids.pop()
+
+    def remove(self, pk):
+        # Поста, которого нет в полном списке, нет и в ленте.
+        if pk not in self.ids and self.complete:
+            return
+        self.count -= 1
+        if pk in self.ids:
+            position = self.ids.index(pk)
+            del self.dates[position]
+            del self.ids[position]
+
+
+def load(feed, queryset):
+    """Возвращает FeedIds ленты или None, если её сейчас собирает другой
+    процесс. queryset должен быть отсортирован по убыванию (pub_date, pk).
+    """
+    key = KEY.format(feed)
+    entry = cache.get(key)
+    if entry is not None or not stale_cache.acquire(key):
+        return entry
+    try:
+        stale_cache.get_lock_cache().delete(DIRTY_KEY.format(feed))
+        limit = settings.FEED_ID_CACHE_LENGTH
+        rows = list(queryset.values_list('pub_date', 'pk')[:limit])
+        count = queryset.count() if len(rows) == limit else len(rows)
+        entry = FeedIds(rows, count)
+        store(feed, entry)
+    finally:
+        stale_cache.release(key)
+    return entry
+
+
+def store(feed, entry):
+    """Сохраняет список, если пока его держали, ленту не изменили."""
+    key = KEY.format(feed)
+    cache.set(key, entry, settings.FEED_ID_CACHE_TIMEOUT)
+    # Флаг проверяется после записи: если его поставили раньше, запись
+    # удаляется здесь, если позже — её удалит тот, кто его поставил.
+    if stale_cache.get_lock_cache().get(DIRTY_KEY.format(feed)):
+        cache.delete(key)
+
+
+def forget(feeds):
+    """Сбрасывает списки лент: они соберутся заново при чтении."""
+    stale_cache.get_lock_cache().set_many(
+        {DIRTY_KEY.format(feed): True for feed in feeds},
+        settings.CACHE_LOCK_TIMEOUT,
+    )
+    cache.delete_many([KEY.format(feed) for feed in feeds])
+
+
+def update(feeds, change):
+    shared = stale_cache.get_lock_cache()
+    for feed in feeds:
+        key = KEY.format(feed)
+        if not stale_cache.acquire(key):
+            forget([feed])
+            continue
+        try:
+            entry = shared.get(key)
+            if entry is not None:
+                change(entry)
+                store(feed, entry)
+        finally:
+            stale_cache.release(key)
+
+
+def get_feeds(post):
+    feeds = [feed_cache.INDEX, feed_cache.profile_feed(post.author_id)]
+    if post.group_id is not None:
+        feeds.append(feed_cache.group_feed(post.group_id))
+    return feeds
+
+
+def add_post(post, feeds):
+    key = to_key(post.pub_date, post.pk)
+    update(
+        feeds,
+        lambda entry: entry.insert(key, settings.FEED_ID_CACHE_LENGTH),
+    )
+
+
+def remove_post(post, feeds):
+    update(feeds, lambda entry: entry.remove(post.pk))
+
+
+def add_posts(feed_posts):
+    """Вставляет посты пачкой: feed_posts — {лента: [посты]}."""
+    for feed, posts in feed_posts.items():
+        keys = [to_key(post.pub_date, post.pk) for post in posts]
+
+        def insert(entry, keys=keys):
+            for key in keys:
+                entry.insert(key, settings.FEED_ID_CACHE_LENGTH)
+
+        update([feed], insert)
+
+
+def remove_posts(feed_posts):
+    """Удаляет посты пачкой: feed_posts — {лента: [посты]}."""
+    for feed, posts in feed_posts.items():
+        pks = [post.pk for post in posts]
+
+        def remove(entry, pks=pks):
+            for pk in pks:
+                entry.remove(pk)
+
+        update([feed], remove)
@@ -0,0 +1,181 @@
+"""Картинки постов: подготовка при загрузке, размеры, объём и формат.
+
+normalize() уменьшает загруженную картинку до POST_IMAGE_MAX_SIZE
+и убирает из неё EXIF, так что хранятся не многомегабайтные оригиналы,
+а картинки, которых хватает для показа. У анимаций уменьшается каждый
+кадр.
+
+Размеры, объём и формат читают из заголовка файла один раз, при
+загрузке, и хранят в полях поста, чтобы при показе не открывать файлы из
+MEDIA_ROOT. Посты, загруженные до появления полей, заполняет команда
+backfill_image_fields.
+"""
+import logging
+import os
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from PIL import Image, ImageOps, ImageSequence
+
+from . import counters, object_cache
+from .models import Post
+
+logger = logging.getLogger(__name__)
+
+FIELDS = ('image_width', 'image_height', 'image_size', 'image_format')
+
+# Значения EXIF Orientation, при которых картинку показывают повёрнутой
+# на 90 градусов.
+ROTATED = {5, 6, 7, 8}
+
+# Форматы, которые хранятся без перекодирования, если картинка не больше
+# POST_IMAGE_MAX_SIZE и в ней нет EXIF.
+KEPT_FORMATS = {'JPEG', 'PNG', 'GIF'}
+
+# Форматы анимаций, которые перекодируются в себя же. Остальные
+# многокадровые картинки, например снимки MPO с телефонов, хранятся как
+# первый кадр.
+ANIMATION_EXTENSIONS = {'GIF': '.gif', 'PNG': '.png', 'WEBP': '.webp'}
+
+
+def get_orientation(image):
+    # getexif() у PNG без EXIF в заголовке декодирует картинку целиком.
+    if 'exif' not in image.info:
+        return None
+    return image.getexif().get(0x0112)
+
+
+def has_alpha(image):
+    return image.mode in ('RGBA', 'LA', 'PA') or (
+        'transparency' in image.info
+    )
+
+
+def is_animation(image):
+    return getattr(image, 'is_animated', False) and (
+        image.format in ANIMATION_EXTENSIONS
+    )
+
+
+def needs_rewrite(image):
+    return (
+        image.format not in KEPT_FORMATS
+        or max(image.size) > settings.POST_IMAGE_MAX_SIZE
+        or 'exif' in image.info
+    )
+
+
+def encode(image):
+    """Перекодирует картинку: JPEG, а с прозрачностью — PNG."""
+    max_size = settings.POST_IMAGE_MAX_SIZE
+    image.thumbnail(
+        (max_size, max_size),
+        Image.LANCZOS,
+        reducing_gap=settings.THUMBNAIL_REDUCING_GAP,
+    )
+    icc_profile = image.info.get('icc_profile')
+    image = ImageOps.exif_transpose(image)
+    # Запись PNG копирует info['exif'] в чанк eXIf.
+    image.info.pop('exif', None)
+    params = {'optimize': True}
+    if icc_profile:
+        params['icc_profile'] = icc_profile
+    if has_alpha(image):
+        image = image.convert('RGBA')
+        image_format, extension = 'PNG', '.png'
+    else:
+        if image.mode not in ('RGB', 'L'):
+            image = image.convert('RGB')
+        image_format, extension = 'JPEG', '.jpg'
+        params.update(quality=settings.POST_IMAGE_QUALITY, progressive=True)
+    buffer = BytesIO()
+    image.save(buffer, image_format, **params)
+    return buffer.getvalue(), image_format, extension
+
+
+def encode_animation(image):
+    """Перекодирует анимацию в тот же формат, уменьшая каждый кадр."""
+    max_size = settings.POST_IMAGE_MAX_SIZE
+    frames, durations = [], []
+    for frame in ImageSequence.Iterator(image):
+        durations.append(frame.info.get('duration', 100))
+        frame = frame.convert('RGBA')
+        frame.thumbnail(
+            (max_size, max_size),
+            Image.LANCZOS,
+            reducing_gap=settings.THUMBNAIL_REDUCING_GAP,
+        )
+        frame.info.pop('exif', None)
+        frames.append(frame)
+    params = {
+        'save_all': True,
+        'append_images': frames[1:],
+        'duration': durations,
+    }
+    if 'loop' in image.info:
+        params['loop'] = image.info['loop']
+    buffer = BytesIO()
+    frames[0].save(buffer, image.format, **params)
+    return buffer.getvalue(), image.format, ANIMATION_EXTENSIONS[image.format]
+
+
+def normalize(file_):
+    """Загруженная картинка, готовая к хранению: исходный файл, если его
+    можно хранить как есть, иначе новый."""
+    file_.seek(0)
+    with Image.open(file_) as image:
+        if not needs_rewrite(image):
+            file_.seek(0)
+            return file_
+        if is_animation(image):
+            data, image_format, extension = encode_animation(image)
+        else:
+            data, image_format, extension = encode(image)
+    name = os.path.splitext(file_.name)[0] + extension
+    logger.info(
+        'Картинка %s перекодирована: %s байт вместо %s',
+        name, len(data), file_.size,
+    )
+    return SimpleUploadedFile(name, data, Image.MIME[image_format])
+
+
+def describe(file_):
+    file_.seek(0)
+    with Image.open(file_) as image:
+        width, height = image.size
+        if get_orientation(image) in ROTATED:
+            width, height = height, width
+        image_format = image.format
+    file_.seek(0)
+    return {
+        'image_width': width,
+        'image_height': height,
+        'image_size': file_.size,
+        'image_format': image_format,
+    }
+
+
+def fill(post):
+    """Записывает в пост сведения о его картинке, не сохраняя его."""
+    values = {'image_format': ''}
+    if post.image:
+        try:
+            values = describe(post.image)
+        except OSError:
+            logger.warning('Не удалось прочитать картинку %s', post.image)
+    for field in FIELDS:
+        setattr(post, field, values.get(field))
+
+
+def backfill(batch_size):
+    """Заполняет поля постов, загруженных без них; отдаёт размер пачек."""
+    queryset = Post.objects.exclude(image='').filter(image_width=None)
+    for pks in counters.batches(queryset, batch_size):
+        posts = list(Post.objects.filter(pk__in=pks).only('image'))
+        for post in posts:
+            fill(post)
+            post.image.close()
+        Post.objects.bulk_update(posts, FIELDS)
+        object_cache.forget_posts(pks)
+        yield len(posts)
@@ -0,0 +1,28 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from posts import images
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет размеры, объём и формат картинок у постов, '
+        'загруженных до появления этих полей.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=settings.BULK_BATCH_SIZE,
+            help='Сколько постов обновлять одним запросом.',
+        )
+
+    def handle(self, *args, **options):
+        total = 0
+        for count in images.backfill(options['batch_size']):
+            total += count
+            self.stdout.write(f'Обработано постов: {total}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово, обработано постов: {total}'
+        ))
@@ -0,0 +1,86 @@
+import time
+from datetime import datetime, timedelta
+
+from django.core.management.base import BaseCommand
+from django.template import Context, Template
+from django.template.loader import get_template
+from django.utils import timezone
+
+from posts.paginators import CursorPaginator
+
+FULL_RANGE_TEMPLATE = Template(
+    '{% for i in page_obj.paginator.page_range %}'
+    '<li class="page-item"><a class="page-link" href="?page={{ i }}">'
+    '{{ i }}</a></li>'
+    '{% endfor %}'
+)
+
+
+class SyntheticPost:
+    def __init__(self, pk):
+        self.pk = pk
+        self.pub_date = datetime(2021, 1, 1, tzinfo=timezone.utc) - timedelta(
+            minutes=pk
+        )
+
+
+class SyntheticFeed:
+    """Лента заданной длины без базы: paginator видит только count()
+    и срезы."""
+
+    def __init__(self, count):
+        self._count = count
+
+    def order_by(self, *fields):
+        return self
+
+    def count(self):
+        return self._count
+
+    def __getitem__(self, index):
+        stop = min(index.stop, self._count)
+        return [SyntheticPost(pk) for pk in range(index.start, stop)]
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает отрисовку полного и сокращённого списка страниц '
+        'для лент разной длины.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--pages',
+            type=int,
+            nargs='+',
+            default=[10, 1000, 100000],
+        )
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def measure(self, template, context, repeat):
+        started = time.perf_counter()
+        for _ in range(repeat):
+            html = template.render(context)
+        return (time.perf_counter() - started) / repeat * 1000, len(html)
+
+    def handle(self, *args, **options):
+        include = get_template('posts/includes/paginator.html')
+        self.stdout.write(
+            f'{"pages":>8} {"full, ms":>10} {"full, KB":>10} '
+            f'{"elided, ms":>11} {"elided, KB":>11}'
+        )
+        for pages in options['pages']:
+            paginator = CursorPaginator(SyntheticFeed(pages * 10), 10)
+            page_obj = paginator.page(pages // 2 or 1)
+            full_ms, full_size = self.measure(
+                FULL_RANGE_TEMPLATE,
+                Context({'page_obj': page_obj}),
+                options['repeat'],
+            )
+            elided_ms, elided_size = self.measure(
+                include, {'page_obj': page_obj}, options['repeat']
+            )
+            self.stdout.write(
+                f'{pages:>8} {full_ms:>10.2f} {full_size / 1024:>10.1f} '
+                f'{elided_ms:>11.2f} {elided_size / 1024:>11.1f}'
+            )
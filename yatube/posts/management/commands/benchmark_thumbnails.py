@@ -0,0 +1,83 @@
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.template.loader import get_template
+from django.test.utils import CaptureQueriesContext
+from sorl.thumbnail import default
+
+from core.thumbnail_kvstore import KVStore
+from posts import thumbnail_worker
+from posts.models import Post
+
+
+class DatabaseKVStore(KVStore):
+    """Хранилище без кэша: каждая проверка миниатюры — запрос к базе."""
+
+    cache = DummyCache('benchmark', {})
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает отрисовку страницы ленты с картинками при хранилище '
+        'миниатюр только в базе, с пустым и с прогретым кэшем.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=10)
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def render(self, posts):
+        # Нулевой таймаут отключает кэш карточек: измеряется отрисовка
+        # каждой карточки, как после изменения постов.
+        card = get_template('posts/includes/post_card.html')
+        for post in posts:
+            card.render({'post': post, 'feed_cache_timeout': 0})
+
+    def measure(self, posts, repeat, prepare):
+        elapsed = 0
+        with CaptureQueriesContext(connection) as queries:
+            for _ in range(repeat):
+                prepare()
+                started = time.perf_counter()
+                self.render(posts)
+                elapsed += time.perf_counter() - started
+        return elapsed / repeat * 1000, len(queries) / repeat
+
+    def handle(self, *args, **options):
+        posts = list(Post.objects.exclude(image='').select_related(
+            'author'
+        ).order_by('-pub_date')[:options['posts']])
+        if not posts:
+            raise CommandError('В базе нет постов с картинками.')
+        for post in posts:
+            thumbnail_worker.generate(
+                post.image.name, settings.POST_THUMBNAILS
+            )
+        kvstore_cache = caches[settings.THUMBNAIL_CACHE]
+        store = KVStore()
+        modes = [
+            ('database', DatabaseKVStore(), lambda: None),
+            ('cold cache', store, kvstore_cache.clear),
+            ('warm cache', store, lambda: None),
+        ]
+        original = default.kvstore
+        self.stdout.write(
+            f'{"kvstore":<12} {"ms/page":>10} {"queries/page":>13}'
+        )
+        try:
+            for name, kvstore, prepare in modes:
+                default.kvstore = kvstore
+                if name == 'warm cache':
+                    list(store.warm(1000))
+                milliseconds, queries = self.measure(
+                    posts, options['repeat'], prepare
+                )
+                self.stdout.write(
+                    f'{name:<12} {milliseconds:>10.2f} {queries:>13.1f}'
+                )
+        finally:
+            default.kvstore = original
@@ -0,0 +1,30 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from posts import timeline
+
+
+class Command(BaseCommand):
+    help = (
+        'Возвращает к раскладке по лентам авторов, у которых подписчиков '
+        'стало меньше TIMELINE_PUSH_FOLLOWERS_LIMIT, и пачками '
+        'дозаполняет ленты их подписчиков.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=settings.TIMELINE_BATCH_SIZE,
+            help='Сколько записей лент вставлять в одной транзакции.',
+        )
+
+    def handle(self, *args, **options):
+        for author_id in timeline.get_demotable_author_ids():
+            total = 0
+            for count in timeline.demote(author_id, options['batch_size']):
+                total += count
+                self.stdout.write(f'Автор {author_id}: лент {total}')
+            self.stdout.write(self.style.SUCCESS(
+                f'Автор {author_id} снова раскладывается по лентам'
+            ))
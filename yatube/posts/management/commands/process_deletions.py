@@ -0,0 +1,29 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from posts import deletion
+
+
+class Command(BaseCommand):
+    help = (
+        'Удаляет пачками данные пользователей, помеченных на удаление. '
+        'После сбоя продолжает с того места, где остановилась.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=settings.BULK_BATCH_SIZE,
+            help='Сколько строк удалять в одной транзакции.',
+        )
+
+    def handle(self, *args, **options):
+        for user_id in deletion.pending():
+            total = 0
+            for count in deletion.process(user_id, options['batch_size']):
+                total += count
+                self.stdout.write(f'Пользователь {user_id}: удалено {total}')
+            self.stdout.write(self.style.SUCCESS(
+                f'Пользователь {user_id} удалён'
+            ))
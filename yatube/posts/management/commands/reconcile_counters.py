@@ -0,0 +1,22 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from posts import counters
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает счётчики постов, комментариев и подписок.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=settings.COUNTERS_BATCH_SIZE,
+            help='Сколько объектов пересчитывать в одной транзакции.',
+        )
+
+    def handle(self, *args, **options):
+        users, posts = counters.reconcile(options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Исправлено счётчиков пользователей: {users}, постов: {posts}'
+        ))
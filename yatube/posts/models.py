@@ -22,6 +22,10 @@ class Post(models.Model):
         'Дата публикации',
         auto_now_add=True
     )
+    updated = models.DateTimeField(
+        'Дата изменения',
+        auto_now=True
+    )
     author = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
@@ -41,6 +45,46 @@ class Post(models.Model):
         'Картинка',
         upload_to='posts/',
         blank=True)
+    # Заполняются при загрузке картинки, см. posts.images.
+    image_width = models.PositiveIntegerField(
+        'Ширина картинки',
+        null=True,
+        editable=False
+    )
+    image_height = models.PositiveIntegerField(
+        'Высота картинки',
+        null=True,
+        editable=False
+    )
+    image_size = models.PositiveIntegerField(
+        'Размер картинки, байт',
+        null=True,
+        editable=False
+    )
+    image_format = models.CharField(
+        'Формат картинки',
+        max_length=10,
+        blank=True,
+        editable=False
+    )
+    comments_count = models.IntegerField(
+        'Комментариев',
+        default=0,
+        editable=False
+    )
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['pub_date'], name='post_pub_date_idx'),
+            models.Index(
+                fields=['group', 'pub_date'],
+                name='post_group_pub_date_idx'
+            ),
+            models.Index(
+                fields=['author', 'pub_date'],
+                name='post_author_pub_date_idx'
+            ),
+        ]
 
     def __str__(self):
         return self.text
@@ -65,6 +109,14 @@ class Comment(models.Model):
         auto_now_add=True
     )
 
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['post', 'created'],
+                name='comment_post_created_idx'
+            ),
+        ]
+
 
 class Follow(models.Model):
     user = models.ForeignKey(
@@ -83,3 +135,77 @@ class Follow(models.Model):
             fields=['author', 'user'],
             name='unique_follow'
         )]
+        indexes = [
+            models.Index(
+                fields=['user', 'author'],
+                name='follow_user_author_idx'
+            ),
+        ]
+
+
+class TimelineEntry(models.Model):
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline'
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries'
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+'
+    )
+    pub_date = models.DateTimeField('Дата публикации')
+
+    class Meta:
+        constraints = [models.UniqueConstraint(
+            fields=['user', 'post'],
+            name='unique_timeline_entry'
+        )]
+        indexes = [
+            models.Index(
+                fields=['user', 'pub_date', 'post'],
+                name='timeline_user_pub_date_idx'
+            ),
+            models.Index(
+                fields=['user', 'author'],
+                name='timeline_user_author_idx'
+            ),
+        ]
+
+
+class PulledAuthor(models.Model):
+    author = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='+'
+    )
+
+
+class UserCounters(models.Model):
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='counters'
+    )
+    posts_count = models.IntegerField('Постов', default=0)
+    followers_count = models.IntegerField('Подписчиков', default=0)
+    following_count = models.IntegerField('Подписок', default=0)
+
+
+class UserDeletion(models.Model):
+    """Пользователь, чьи записи скрыты и удаляются в фоне."""
+
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='deletion'
+    )
+    created = models.DateTimeField('Дата запроса', auto_now_add=True)
@@ -0,0 +1,113 @@
+"""Кэш постов, групп и пользователей.
+
+Объекты хранятся по первичному ключу; slug группы и имя пользователя
+ссылаются на первичный ключ, и объект по нему проверяется, так что
+переименование не требует отдельной инвалидации. Посты хранятся вместе
+с автором и группой, пользователи — со счётчиками. Посты и страницы
+пользователей, удаляемых в фоне, не отдаются. Сигналы удаляют
+запись при изменении объекта, а для поста — ещё и его группы или автора.
+
+Память ограничена самим кэшем: L1 TieredCache вытесняет давно не
+читавшиеся записи, L2 — по MAX_ENTRIES.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.http import Http404
+
+from . import hidden
+from .models import Group, Post, User
+
+POST_KEY = 'object:post:{}'
+GROUP_KEY = 'object:group:{}'
+GROUP_SLUG_KEY = 'object:group_slug:{}'
+USER_KEY = 'object:user:{}'
+USERNAME_KEY = 'object:username:{}'
+
+
+def get_many(key, queryset, ids):
+    keys = {key.format(pk): pk for pk in ids}
+    objects = {
+        keys[cache_key]: obj
+        for cache_key, obj in cache.get_many(list(keys)).items()
+    }
+    missing = [pk for pk in ids if pk not in objects]
+    if missing:
+        fetched = queryset.in_bulk(missing)
+        cache.set_many(
+            {key.format(pk): obj for pk, obj in fetched.items()},
+            settings.OBJECT_CACHE_TIMEOUT,
+        )
+        objects.update(fetched)
+    return [objects[pk] for pk in ids if pk in objects]
+
+
+def get_by_field(key, alias_key, queryset, field, value):
+    pk = cache.get(alias_key.format(value))
+    if pk is not None:
+        objects = get_many(key, queryset, [pk])
+        if objects and getattr(objects[0], field) == value:
+            return objects[0]
+    obj = queryset.filter(**{field: value}).first()
+    if obj is None:
+        return None
+    cache.set_many(
+        {alias_key.format(value): obj.pk, key.format(obj.pk): obj},
+        settings.OBJECT_CACHE_TIMEOUT,
+    )
+    return obj
+
+
+def get_posts(ids):
+    """Возвращает посты в порядке ids, пропуская удалённые и скрытые."""
+    posts = get_many(
+        POST_KEY, Post.objects.select_related('author', 'group'), ids
+    )
+    hidden_ids = hidden.get_ids()
+    return [post for post in posts if post.author_id not in hidden_ids]
+
+
+def get_post_or_404(pk):
+    posts = get_posts([pk])
+    if not posts:
+        raise Http404('No Post matches the given query.')
+    return posts[0]
+
+
+def get_group_or_404(slug):
+    group = get_by_field(
+        GROUP_KEY, GROUP_SLUG_KEY, Group.objects.all(), 'slug', slug
+    )
+    if group is None:
+        raise Http404('No Group matches the given query.')
+    return group
+
+
+def get_user_or_404(username):
+    user = get_by_field(
+        USER_KEY,
+        USERNAME_KEY,
+        User.objects.select_related('counters'),
+        'username',
+        username,
+    )
+    if user is None or user.pk in hidden.get_ids():
+        raise Http404('No User matches the given query.')
+    return user
+
+
+def forget(key, ids):
+    keys = [key.format(pk) for pk in ids]
+    if keys:
+        cache.delete_many(keys)
+
+
+def forget_posts(ids):
+    forget(POST_KEY, ids)
+
+
+def forget_group(pk):
+    forget(GROUP_KEY, [pk])
+
+
+def forget_user(pk):
+    forget(USER_KEY, [pk])
@@ -0,0 +1,72 @@
+"""Кэш целых страниц для анонимных читателей.
+
+Вместе с ответом хранятся версии лент (теги), из которых он собран.
+Ответ отдаётся из кэша, только пока все эти версии актуальны, поэтому
+сигналы моделей инвалидируют страницы так же, как и фрагменты лент.
+Пока один запрос пересобирает устаревшую страницу, остальные получают
+её предыдущую копию.
+"""
+import hashlib
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+
+from core import stale_cache
+
+from . import feed_cache
+
+KEY = 'page:{}'
+
+
+def get_cache_key(request):
+    path = hashlib.md5(request.get_full_path().encode()).hexdigest()
+    return KEY.format(path)
+
+
+def is_cacheable_request(request):
+    return (
+        settings.PAGE_CACHE_TIMEOUT
+        and request.method in ('GET', 'HEAD')
+        and not request.user.is_authenticated
+    )
+
+
+def is_cacheable_response(request, response):
+    return (
+        response.status_code == 200
+        and not response.streaming
+        and not response.cookies
+        and not request.META.get('CSRF_COOKIE_USED')
+        and getattr(request, 'cache_tags', None)
+    )
+
+
+def cache_anonymous_page(view):
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if not is_cacheable_request(request):
+            return view(request, *args, **kwargs)
+        key = get_cache_key(request)
+        entry = cache.get(key)
+        if entry is not None:
+            tags, response = entry
+            current = feed_cache.get_versions(list(tags))
+            if current == list(tags.values()):
+                return response
+        locked = stale_cache.acquire(key)
+        if not locked and entry is not None:
+            return entry[1]
+        try:
+            response = view(request, *args, **kwargs)
+            if is_cacheable_response(request, response):
+                cache.set(
+                    key,
+                    (request.cache_tags, response),
+                    settings.PAGE_CACHE_TIMEOUT,
+                )
+        finally:
+            if locked:
+                stale_cache.release(key)
+        return response
+    return wrapper
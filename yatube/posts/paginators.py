@@ -0,0 +1,332 @@
+import base64
+import heapq
+from itertools import islice
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.paginator import Page, Paginator
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from django.utils import timezone
+from django.utils.functional import cached_property
+
+from . import id_cache, object_cache
+
+NEXT = 'n'
+PREVIOUS = 'p'
+
+COUNT_KEY = 'feed_count:{}'
+
+
+def encode_cursor(post, direction=NEXT):
+    raw = f'{direction}|{post.pub_date.isoformat()}|{post.pk}'
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Возвращает (direction, pub_date, pk) или None для битого курсора."""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        raw = base64.urlsafe_b64decode(padded.encode()).decode()
+        direction, pub_date, pk = raw.split('|')
+        pub_date = parse_datetime(pub_date)
+        pk = int(pk)
+        # encode_cursor() пишет дату с часовым поясом; дату без него
+        # сравнить с датами из базы нельзя.
+        if direction not in (NEXT, PREVIOUS) or pub_date is None or (
+            timezone.is_naive(pub_date)
+        ):
+            return None
+        # Крайние даты со смещением не переводятся в UTC: это проверяется
+        # здесь, а не в запросе к базе.
+        pub_date = pub_date.astimezone(timezone.utc)
+    except (ValueError, OverflowError):
+        return None
+    return direction, pub_date, pk
+
+
+class CursorPage(Page):
+    """Страница, выбранная по ключу (pub_date, pk) без OFFSET и COUNT(*).
+
+    Номера у такой страницы нет: соседние страницы доступны только
+    через next_cursor и previous_cursor.
+    """
+
+    def __init__(self, paginator, direction, pub_date, pk):
+        self.paginator = paginator
+        self.number = None
+        self.direction = direction
+        self.pub_date = pub_date
+        self.pk = pk
+
+    def __repr__(self):
+        return f'<Page {self.direction}:{self.pub_date}:{self.pk}>'
+
+    @cached_property
+    def _rows(self):
+        per_page = self.paginator.per_page
+        rows = self.paginator.seek(
+            self.direction, self.pub_date, self.pk, per_page + 1
+        )
+        has_more = len(rows) > per_page
+        rows = rows[:per_page]
+        if self.direction == NEXT:
+            return rows, has_more, True
+        return rows[::-1], True, has_more
+
+    @property
+    def object_list(self):
+        return self._rows[0]
+
+    def has_next(self):
+        return bool(self.object_list) and self._rows[1]
+
+    def has_previous(self):
+        return bool(self.object_list) and self._rows[2]
+
+    @property
+    def next_cursor(self):
+        if self.has_next():
+            return encode_cursor(self.object_list[-1], NEXT)
+        return None
+
+    @property
+    def previous_cursor(self):
+        if self.has_previous():
+            return encode_cursor(self.object_list[0], PREVIOUS)
+        return None
+
+
+class CursorPaginator(Paginator):
+    """Paginator, умеющий листать ленту постов по курсору.
+
+    Номерные страницы (?page=N) продолжают работать для совместимости,
+    но ссылки «вперёд/назад» всегда строятся по курсору, поэтому их
+    стоимость не зависит от глубины ленты.
+
+    key_fields задаёт поля, по которым сортируется и фильтруется выборка,
+    а hydrate превращает строки выборки в посты, если листается не сама
+    таблица постов. Значения key_fields должны совпадать с pub_date и pk
+    получившихся постов.
+    """
+
+    key_fields = ('pub_date', 'pk')
+    ELLIPSIS = '…'
+
+    def __init__(self, object_list, per_page, key_fields=None, hydrate=None,
+                 **kwargs):
+        if key_fields is not None:
+            self.key_fields = key_fields
+        self._hydrate = hydrate
+        super().__init__(
+            object_list.order_by(*(f'-{field}' for field in self.key_fields)),
+            per_page,
+            **kwargs
+        )
+
+    def hydrate(self, rows):
+        if self._hydrate is None:
+            return rows
+        return self._hydrate(rows)
+
+    def _get_page(self, object_list, number, paginator):
+        if self._hydrate is not None:
+            object_list = self._hydrate(object_list)
+        return super()._get_page(object_list, number, paginator)
+
+    def seek(self, direction, pub_date, pk, limit):
+        """Возвращает до limit постов за курсором, ближайшие первыми."""
+        date_field, pk_field = self.key_fields
+        lookup = 'lt' if direction == NEXT else 'gt'
+        queryset = self.object_list.filter(
+            Q(**{f'{date_field}__{lookup}': pub_date})
+            | Q(**{date_field: pub_date, f'{pk_field}__{lookup}': pk})
+        )
+        if direction == PREVIOUS:
+            queryset = queryset.order_by(date_field, pk_field)
+        return self.hydrate(list(queryset[:limit]))
+
+    def get_page(self, number=None, cursor=None):
+        if cursor:
+            decoded = decode_cursor(cursor)
+            if decoded is not None:
+                return CursorPage(self, *decoded)
+        return super().get_page(number)
+
+    @property
+    def approximate(self):
+        """Число записей велико, и показывать его стоит округлённым."""
+        return self.count > settings.PAGINATOR_EXACT_COUNT_LIMIT
+
+    def get_elided_page_range(self, number=1, *, on_each_side=3, on_ends=2):
+        """Номера страниц вокруг текущей и на краях, пропуски заменены на
+        ELLIPSIS. Длина не зависит от числа страниц."""
+        number = self.validate_number(number)
+        num_pages = self.num_pages
+        if num_pages <= (on_each_side + on_ends) * 2:
+            yield from self.page_range
+            return
+        if number > on_each_side + on_ends + 1:
+            yield from range(1, on_ends + 1)
+            yield self.ELLIPSIS
+            yield from range(number - on_each_side, number + 1)
+        else:
+            yield from range(1, number + 1)
+        if number < num_pages - on_each_side - on_ends:
+            yield from range(number + 1, number + on_each_side + 1)
+            yield self.ELLIPSIS
+            yield from range(num_pages - on_ends + 1, num_pages + 1)
+        else:
+            yield from range(number + 1, num_pages + 1)
+
+    def next_cursor(self, page):
+        if isinstance(page, CursorPage):
+            return page.next_cursor
+        if page.has_next() and len(page):
+            return encode_cursor(page[-1], NEXT)
+        return None
+
+    def previous_cursor(self, page):
+        if isinstance(page, CursorPage):
+            return page.previous_cursor
+        if page.has_previous() and len(page):
+            return encode_cursor(page[0], PREVIOUS)
+        return None
+
+
+class CachedCountPaginator(CursorPaginator):
+    """CursorPaginator, который не считает большие выборки на каждый
+    запрос.
+
+    Выборки до PAGINATOR_EXACT_COUNT_LIMIT записей считаются точно, через
+    COUNT(*) с LIMIT. Число записей в больших выборках хранится в кэше под
+    count_key PAGINATOR_COUNT_TIMEOUT секунд и может немного отставать.
+    """
+
+    def __init__(self, object_list, per_page, count_key, **kwargs):
+        self.count_key = count_key
+        super().__init__(object_list, per_page, **kwargs)
+
+    @cached_property
+    def count(self):
+        key = COUNT_KEY.format(self.count_key)
+        count = cache.get(key)
+        if count is not None:
+            return count
+        limit = settings.PAGINATOR_EXACT_COUNT_LIMIT
+        count = self.object_list.order_by()[:limit + 1].count()
+        if count > limit:
+            count = self.object_list.count()
+            cache.set(key, count, settings.PAGINATOR_COUNT_TIMEOUT)
+        return count
+
+
+class IdListPaginator(CachedCountPaginator):
+    """CursorPaginator, который берёт начало ленты feed из кэша списков id
+    и достаёт посты из кэша объектов. Остальная часть ленты читается из
+    object_list."""
+
+    def __init__(self, object_list, per_page, feed, **kwargs):
+        self.feed = feed
+        super().__init__(object_list, per_page, count_key=feed, **kwargs)
+
+    @cached_property
+    def feed_ids(self):
+        return id_cache.load(self.feed, self.object_list)
+
+    @cached_property
+    def count(self):
+        if self.feed_ids is not None:
+            return self.feed_ids.count
+        return super().count
+
+    def page(self, number):
+        number = self.validate_number(number)
+        bottom = (number - 1) * self.per_page
+        top = bottom + self.per_page
+        if top + self.orphans >= self.count:
+            top = self.count
+        ids = None
+        if self.feed_ids is not None:
+            ids = self.feed_ids.slice(bottom, top)
+        if ids is None:
+            return super().page(number)
+        return self._get_page(object_cache.get_posts(ids), number, self)
+
+    def seek(self, direction, pub_date, pk, limit):
+        ids = None
+        if self.feed_ids is not None:
+            key = id_cache.to_key(pub_date, pk)
+            if direction == NEXT:
+                ids = self.feed_ids.seek_next(key, limit)
+            else:
+                ids = self.feed_ids.seek_previous(key, limit)
+        if ids is None:
+            return super().seek(direction, pub_date, pk, limit)
+        return object_cache.get_posts(ids)
+
+
+def post_key(post):
+    return post.pub_date, post.pk
+
+
+class MergedFeed:
+    """Ленты нескольких CursorPaginator, слитые в одну по (pub_date, pk)."""
+
+    def __init__(self, paginators):
+        self.paginators = paginators
+
+    def count(self):
+        return sum(paginator.count for paginator in self.paginators)
+
+    def __getitem__(self, index):
+        merged = heapq.merge(
+            *(
+                paginator.hydrate(list(paginator.object_list[:index.stop]))
+                for paginator in self.paginators
+            ),
+            key=post_key,
+            reverse=True,
+        )
+        return list(islice(merged, index.start, index.stop))
+
+
+class MergedCursorPaginator(CursorPaginator):
+    """k-way слияние нескольких лент, в том числе по курсору."""
+
+    def __init__(self, paginators, per_page, **kwargs):
+        self.paginators = paginators
+        self._hydrate = None
+        Paginator.__init__(self, MergedFeed(paginators), per_page, **kwargs)
+
+    def seek(self, direction, pub_date, pk, limit):
+        merged = heapq.merge(
+            *(
+                paginator.seek(direction, pub_date, pk, limit)
+                for paginator in self.paginators
+            ),
+            key=post_key,
+            reverse=direction == NEXT,
+        )
+        return list(islice(merged, limit))
+
+
+def get_requested_page(request, paginator):
+    return paginator.get_page(
+        request.GET.get('page'),
+        cursor=request.GET.get('cursor'),
+    )
+
+
+def get_page_obj(request, queryset, feed=None, **kwargs):
+    if feed is not None:
+        kwargs['feed'] = feed
+        paginator_class = IdListPaginator
+    else:
+        paginator_class = CursorPaginator
+    paginator = paginator_class(
+        queryset,
+        settings.PAGINATOR_OBJECTS_PER_PAGE,
+        **kwargs
+    )
+    return get_requested_page(request, paginator)
@@ -0,0 +1,157 @@
+"""Полнотекстовый поиск по постам на FTS5.
+
+Индекс — отдельная таблица FTS5 с собственной копией текста, rowid
+совпадает с id поста. Триггеры на posts_post не подходят: Django на
+SQLite пересоздаёт таблицу при изменении схемы и триггеры теряются,
+поэтому индекс обновляют сигналы. Если он разошёлся с данными (например,
+после queryset.update()), его пересобирает команда rebuild_search_index.
+
+Результаты упорядочены по bm25, страницы листаются курсором по паре
+(rank, id), без OFFSET.
+"""
+import base64
+import re
+
+from django.db import connection
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+from . import object_cache
+from .models import Post
+
+TABLE = 'posts_post_fts'
+SNIPPET_TOKENS = 16
+MARK_START = '\x02'
+MARK_END = '\x03'
+
+CREATE_SQL = (
+    f'CREATE VIRTUAL TABLE IF NOT EXISTS {TABLE} '
+    "USING fts5(text, tokenize='unicode61 remove_diacritics 2')"
+)
+DROP_SQL = f'DROP TABLE IF EXISTS {TABLE}'
+FILL_SQL = f'INSERT INTO {TABLE}(rowid, text) SELECT id, text FROM posts_post'
+SEARCH_SQL = (
+    f"SELECT rowid, rank, snippet({TABLE}, 0, char(2), char(3), '…', %s) "
+    f'FROM {TABLE} WHERE {TABLE} MATCH %s '
+    'AND (rank > %s OR (rank = %s AND rowid > %s)) '
+    'ORDER BY rank, rowid LIMIT %s'
+)
+IDS_SQL = f'SELECT rowid FROM {TABLE} WHERE {TABLE} MATCH %s'
+
+
+def to_match(query):
+    """Превращает ввод пользователя в выражение MATCH: каждое слово ищется
+    по префиксу, все слова обязательны. Возвращает None, если слов нет."""
+    words = re.findall(r'\w+', query)
+    if not words:
+        return None
+    return ' '.join(f'"{word}"*' for word in words)
+
+
+def encode_cursor(rank, pk):
+    raw = f'{rank!r}|{pk}'
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Возвращает (rank, pk) или None для битого курсора."""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        raw = base64.urlsafe_b64decode(padded.encode()).decode()
+        rank, pk = raw.split('|')
+        return float(rank), int(pk)
+    except ValueError:
+        return None
+
+
+def highlight(snippet):
+    return mark_safe(
+        escape(snippet)
+        .replace(MARK_START, '<mark>')
+        .replace(MARK_END, '</mark>')
+    )
+
+
+class SearchResult:
+    def __init__(self, post, snippet):
+        self.post = post
+        self.snippet = snippet
+
+
+class SearchPage:
+    def __init__(self, query, results, next_cursor):
+        self.query = query
+        self.results = results
+        self.next_cursor = next_cursor
+
+    def __iter__(self):
+        return iter(self.results)
+
+    def __len__(self):
+        return len(self.results)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+
+def search(query, limit, cursor=None):
+    match = to_match(query)
+    if match is None:
+        return SearchPage(query, [], None)
+    rank, pk = (cursor and decode_cursor(cursor)) or (float('-inf'), 0)
+    with connection.cursor() as db:
+        db.execute(
+            SEARCH_SQL, [SNIPPET_TOKENS, match, rank, rank, pk, limit + 1]
+        )
+        rows = db.fetchall()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1][1], rows[-1][0])
+    snippets = {row[0]: highlight(row[2]) for row in rows}
+    posts = object_cache.get_posts([row[0] for row in rows])
+    results = [SearchResult(post, snippets[post.pk]) for post in posts]
+    return SearchPage(query, results, next_cursor)
+
+
+def filter_posts(queryset, query):
+    """Оставляет в queryset посты, подходящие под запрос."""
+    match = to_match(query)
+    if match is None:
+        return queryset.none()
+    # pk__in=RawSQL(...) Django оборачивает в лишние скобки, и SQLite
+    # берёт из подзапроса только первую строку.
+    return queryset.extra(
+        where=[f'"posts_post"."id" IN ({IDS_SQL})'], params=[match]
+    )
+
+
+def index_post(post):
+    with connection.cursor() as db:
+        db.execute(f'DELETE FROM {TABLE} WHERE rowid = %s', [post.pk])
+        db.execute(
+            f'INSERT INTO {TABLE}(rowid, text) VALUES (%s, %s)',
+            [post.pk, post.text],
+        )
+
+
+def unindex_post(post):
+    unindex_posts([post.pk])
+
+
+def unindex_posts(pks):
+    placeholders = ', '.join(['%s'] * len(pks))
+    with connection.cursor() as db:
+        db.execute(
+            f'DELETE FROM {TABLE} WHERE rowid IN ({placeholders})', list(pks)
+        )
+
+
+def rebuild():
+    """Пересобирает индекс и возвращает число проиндексированных постов."""
+    with connection.cursor() as db:
+        db.execute(DROP_SQL)
+        db.execute(CREATE_SQL)
+        db.execute(FILL_SQL)
+        db.execute(f"INSERT INTO {TABLE}({TABLE}) VALUES ('optimize')")
+    return Post.objects.count()
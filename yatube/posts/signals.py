@@ -0,0 +1,216 @@
+from django.db.models.signals import (post_delete, post_save, pre_delete,
+                                      pre_save)
+from django.dispatch import receiver
+from django.utils import timezone
+
+from . import (counters, feed_cache, id_cache, images, object_cache, search,
+               timeline)
+from .models import Comment, Follow, Group, Post, User, UserCounters
+
+
+def bump_post_feeds(post, extra_group_ids=()):
+    feed_cache.bump(*feed_cache.post_feeds([post], extra_group_ids))
+
+
+# Поля пользователя, которые показывают карточки его постов.
+USER_CARD_FIELDS = ('username', 'first_name', 'last_name')
+
+
+def touch_posts(posts):
+    """Обновляет updated у постов, чьи карточки показывают изменившуюся
+    группу, чтобы карточки пересобрались."""
+    pks = list(posts.values_list('pk', flat=True))
+    Post.objects.filter(pk__in=pks).update(updated=timezone.now())
+    object_cache.forget_posts(pks)
+
+
+@receiver(pre_save, sender=Post)
+def remember_group(sender, instance, raw=False, **kwargs):
+    if instance.pk is not None and not raw:
+        instance._previous_group_id = Post.objects.filter(
+            pk=instance.pk
+        ).values_list('group_id', flat=True).first()
+
+
+@receiver(pre_save, sender=Post)
+def describe_image(sender, instance, raw=False, **kwargs):
+    # Незакоммиченный файл — только что загруженная картинка.
+    if not raw and not (instance.image and instance.image._committed):
+        images.fill(instance)
+
+
+@receiver(post_save, sender=Post)
+def push_to_timelines(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        timeline.push_post(instance)
+
+
+@receiver(post_save, sender=Post)
+def count_new_post(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        counters.change_user(instance.author_id, posts_count=1)
+
+
+@receiver(post_delete, sender=Post)
+def count_deleted_post(sender, instance, **kwargs):
+    counters.change_user(instance.author_id, posts_count=-1)
+
+
+# Списки id обновляются раньше, чем меняются версии лент: иначе другой
+# процесс мог бы собрать фрагмент новой версии по старому списку.
+@receiver(post_save, sender=Post)
+def add_to_id_lists(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    object_cache.forget_posts([instance.pk])
+    if created:
+        id_cache.add_post(instance, id_cache.get_feeds(instance))
+        return
+    previous_group_id = getattr(instance, '_previous_group_id', None)
+    if previous_group_id != instance.group_id:
+        if previous_group_id is not None:
+            id_cache.remove_post(
+                instance, [feed_cache.group_feed(previous_group_id)]
+            )
+        if instance.group_id is not None:
+            id_cache.add_post(
+                instance, [feed_cache.group_feed(instance.group_id)]
+            )
+
+
+@receiver(post_delete, sender=Post)
+def remove_from_id_lists(sender, instance, **kwargs):
+    object_cache.forget_posts([instance.pk])
+    id_cache.remove_post(instance, id_cache.get_feeds(instance))
+
+
+@receiver(post_save, sender=Post)
+def index_post(sender, instance, raw=False, **kwargs):
+    if not raw:
+        search.index_post(instance)
+
+
+@receiver(post_delete, sender=Post)
+def unindex_post(sender, instance, **kwargs):
+    search.unindex_post(instance)
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def bump_post_cache(sender, instance, raw=False, **kwargs):
+    if not raw:
+        bump_post_feeds(
+            instance,
+            [getattr(instance, '_previous_group_id', None)],
+        )
+
+
+@receiver(post_save, sender=Comment)
+def count_new_comment(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        counters.change_post(instance.post_id, 1)
+
+
+@receiver(post_delete, sender=Comment)
+def count_deleted_comment(sender, instance, **kwargs):
+    counters.change_post(instance.post_id, -1)
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def bump_comment_cache(sender, instance, raw=False, **kwargs):
+    post = Post.objects.filter(pk=instance.post_id).first()
+    if post is not None and not raw:
+        bump_post_feeds(post)
+
+
+@receiver(post_save, sender=Group)
+@receiver(pre_delete, sender=Group)
+def forget_cached_group(sender, instance, raw=False, **kwargs):
+    if not raw:
+        object_cache.forget_group(instance.pk)
+        touch_posts(instance.posts.all())
+
+
+@receiver(pre_save, sender=User)
+def remember_names(sender, instance, raw=False, update_fields=None,
+                   **kwargs):
+    if raw or instance.pk is None or (
+        update_fields is not None
+        and not set(update_fields) & set(USER_CARD_FIELDS)
+    ):
+        return
+    instance._previous_names = User.objects.filter(
+        pk=instance.pk
+    ).values_list(*USER_CARD_FIELDS).first()
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def forget_cached_user(sender, instance, raw=False, update_fields=None,
+                       **kwargs):
+    if raw or update_fields == frozenset(['last_login']):
+        return
+    object_cache.forget_user(instance.pk)
+    previous = getattr(instance, '_previous_names', None)
+    if previous is None:
+        return
+    del instance._previous_names
+    names = tuple(getattr(instance, field) for field in USER_CARD_FIELDS)
+    if names != previous:
+        # Строки постов не меняются: карточки учитывают имя автора в
+        # ключе, а посты в кэше объектов хранятся вместе с автором.
+        object_cache.forget_posts(
+            list(instance.posts.values_list('pk', flat=True))
+        )
+        feed_cache.bump(
+            *feed_cache.author_feeds(instance.pk),
+            *feed_cache.follower_feeds(instance.pk),
+        )
+
+
+@receiver(post_save, sender=User)
+def create_user_counters(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        UserCounters.objects.get_or_create(user=instance)
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def bump_group_cache(sender, instance, raw=False, **kwargs):
+    if not raw:
+        feed_cache.bump(feed_cache.GROUPS, feed_cache.group_feed(instance.pk))
+
+
+@receiver(post_save, sender=Follow)
+def add_follow_to_timeline(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        timeline.follow(instance.user_id, instance.author_id)
+        feed_cache.bump(feed_cache.follow_feed(instance.user_id))
+
+
+@receiver(post_delete, sender=Follow)
+def remove_follow_from_timeline(sender, instance, **kwargs):
+    timeline.unfollow(instance.user_id, instance.author_id)
+    feed_cache.bump(feed_cache.follow_feed(instance.user_id))
+
+
+@receiver(post_save, sender=Follow)
+def count_new_follow(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        counters.change_user(instance.author_id, followers_count=1)
+        counters.change_user(instance.user_id, following_count=1)
+        feed_cache.bump(
+            feed_cache.profile_feed(instance.author_id),
+            feed_cache.profile_feed(instance.user_id),
+        )
+
+
+@receiver(post_delete, sender=Follow)
+def count_deleted_follow(sender, instance, **kwargs):
+    counters.change_user(instance.author_id, followers_count=-1)
+    counters.change_user(instance.user_id, following_count=-1)
+    feed_cache.bump(
+        feed_cache.profile_feed(instance.author_id),
+        feed_cache.profile_feed(instance.user_id),
+    )
@@ -0,0 +1,10 @@
+from django import template
+
+from posts import thumbnails
+
+register = template.Library()
+
+
+@register.simple_tag
+def post_thumbnail(post, geometry, **options):
+    return thumbnails.get_thumbnail(post, geometry, **options)
@@ -0,0 +1,61 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Follow, Group, Post
+
+User = get_user_model()
+
+
+class AdminTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='pass'
+        )
+        cls.group = Group.objects.create(
+            title='title', slug='slug', description='description'
+        )
+        cls.users = [
+            User.objects.create_user(username=f'user{i}') for i in range(5)
+        ]
+        for user in cls.users:
+            Post.objects.create(author=user, group=cls.group, text='text')
+            Follow.objects.create(user=user, author=cls.admin)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.admin)
+
+    def test_changelists_do_not_depend_on_table_size(self):
+        """Списки в админке не грузят связанные объекты по одному."""
+        # Сессия, пользователь, count и страница; для постов — ещё два
+        # запроса date_hierarchy по индексу pub_date и список групп для
+        # действия переноса.
+        changelists = {'posts_post': 7, 'posts_comment': 4, 'posts_follow': 4}
+        for name, queries in changelists.items():
+            url = reverse(f'admin:{name}_changelist')
+            with self.subTest(name=name):
+                with self.assertNumQueries(queries):
+                    response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+
+    def test_post_form_uses_autocomplete(self):
+        """Форма поста не выводит всех пользователей в <select>."""
+        response = self.client.get(reverse('admin:posts_post_add'))
+        self.assertNotContains(response, 'user4')
+        self.assertContains(response, 'admin-autocomplete')
+
+    def test_follow_filter_by_username(self):
+        """Подписки фильтруются по введённому имени подписчика."""
+        response = self.client.get(
+            reverse('admin:posts_follow_changelist'), {'user': 'user3'}
+        )
+        self.assertEqual(
+            [follow.user for follow in response.context['cl'].result_list],
+            [self.users[3]],
+        )
+        self.assertNotContains(response, 'user4')
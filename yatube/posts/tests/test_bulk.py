@@ -0,0 +1,142 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from .. import bulk, feed_cache, id_cache, search
+from ..models import (Comment, Follow, Group, Post, TimelineEntry,
+                      UserCounters)
+from ..paginators import IdListPaginator
+
+User = get_user_model()
+
+
+class BulkTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='pass'
+        )
+        cls.spammer = User.objects.create_user(username='spammer')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='title', slug='slug', description='description'
+        )
+        cls.other_group = Group.objects.create(
+            title='other', slug='other', description='description'
+        )
+        Follow.objects.create(user=cls.reader, author=cls.spammer)
+        cls.posts = [
+            Post.objects.create(
+                author=cls.spammer, group=cls.group, text=f'spam {i}'
+            )
+            for i in range(5)
+        ]
+        cls.post = Post.objects.create(author=cls.admin, text='ham')
+        for post in cls.posts[:2]:
+            Comment.objects.create(
+                post=cls.post, author=cls.spammer, text='spam'
+            )
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.admin)
+
+    def get_ids(self, feed, queryset):
+        list(IdListPaginator(queryset, 10, feed=feed).page(1))
+        return list(cache.get(id_cache.KEY.format(feed)).ids)
+
+    def get_counters(self, user):
+        counters = UserCounters.objects.get(user=user)
+        return (
+            counters.posts_count,
+            counters.followers_count,
+            counters.following_count,
+        )
+
+    def run_action(self, model, action, queryset):
+        return self.client.post(
+            reverse(f'admin:posts_{model}_changelist'),
+            {
+                'action': action,
+                '_selected_action': [obj.pk for obj in queryset],
+            },
+            follow=True,
+        )
+
+    def test_move_posts_updates_group_lists(self):
+        """Перенос постов пачками обновляет списки id обеих групп."""
+        group_feed = feed_cache.group_feed(self.group.pk)
+        other_feed = feed_cache.group_feed(self.other_group.pk)
+        self.get_ids(group_feed, self.group.posts.all())
+        self.get_ids(other_feed, self.other_group.posts.all())
+        moved = Post.objects.filter(pk__in=[p.pk for p in self.posts[:3]])
+        # По шесть запросов на пачку независимо от её размера и один на
+        # поиск следующей, пустой пачки.
+        with self.assertNumQueries(13):
+            self.assertEqual(
+                sum(bulk.move_posts(moved, self.other_group, 2)), 3
+            )
+        self.assertEqual(
+            sorted(self.get_ids(other_feed, self.other_group.posts.all())),
+            sorted(post.pk for post in self.posts[:3]),
+        )
+        self.assertEqual(
+            self.get_ids(group_feed, self.group.posts.all()),
+            [post.pk for post in reversed(self.posts[3:])],
+        )
+
+    def test_move_posts_from_admin(self):
+        """Действие админки переносит посты в выбранную группу."""
+        response = self.client.post(
+            reverse('admin:posts_post_changelist'),
+            {
+                'action': 'move_to_group',
+                'group': self.other_group.pk,
+                '_selected_action': [post.pk for post in self.posts[:2]],
+            },
+            follow=True,
+        )
+        self.assertContains(response, 'Перенесено в «other»: 2')
+        self.assertEqual(self.other_group.posts.count(), 2)
+        self.assertEqual(self.group.posts.count(), 3)
+
+    def test_move_posts_from_admin_without_group(self):
+        """Пустой выбор группы убирает посты из групп."""
+        self.run_action('post', 'move_to_group', self.posts[:1])
+        self.assertIsNone(Post.objects.get(pk=self.posts[0].pk).group)
+
+    def test_purge_author_from_admin(self):
+        """Чистка автора удаляет его посты, комментарии и их следы."""
+        self.get_ids(feed_cache.INDEX, Post.objects.all())
+        response = self.run_action('post', 'purge_authors', self.posts[:1])
+        self.assertContains(response, 'Удалено постов и комментариев: 7')
+        self.assertFalse(Post.objects.filter(author=self.spammer).exists())
+        self.assertFalse(TimelineEntry.objects.exists())
+        self.assertEqual(self.get_counters(self.spammer), (0, 1, 0))
+        self.assertEqual(Post.objects.get(pk=self.post.pk).comments_count, 0)
+        self.assertEqual(
+            self.get_ids(feed_cache.INDEX, Post.objects.all()), [self.post.pk]
+        )
+        page = search.search('spam', 10)
+        self.assertEqual(len(page), 0)
+
+    def test_delete_comments_by_author(self):
+        """Удаление комментариев автора обновляет счётчик поста."""
+        response = self.run_action(
+            'comment', 'delete_by_authors', Comment.objects.all()[:1]
+        )
+        self.assertContains(response, 'Удалено комментариев: 2')
+        self.assertEqual(Post.objects.get(pk=self.post.pk).comments_count, 0)
+
+    def test_delete_follows(self):
+        """Удаление подписок чистит ленту и счётчики обоих пользователей."""
+        response = self.run_action(
+            'follow', 'delete_in_bulk', Follow.objects.all()
+        )
+        self.assertContains(response, 'Удалено подписок: 1')
+        self.assertFalse(TimelineEntry.objects.exists())
+        self.assertEqual(self.get_counters(self.spammer), (5, 0, 0))
+        self.assertEqual(self.get_counters(self.reader), (0, 0, 0))
@@ -1,9 +1,15 @@
+import hashlib
+
 from django.contrib.auth import get_user_model
 from django.core.cache import cache
 from django.test import Client, TestCase
 from django.urls import reverse
 
-from ..models import Group, Post
+from core import stale_cache
+
+from .. import object_cache
+from ..models import Comment, Follow, Group, Post
+from ..page_cache import KEY
 
 User = get_user_model()
 
@@ -13,6 +19,7 @@ class CacheTests(TestCase):
     def setUpClass(cls):
         super().setUpClass()
         cls.user = User.objects.create_user(username='auth')
+        cls.follower = User.objects.create_user(username='follower')
         cls.group = Group.objects.create(
             title='title',
             slug='slug',
@@ -23,20 +30,235 @@ class CacheTests(TestCase):
             group=cls.group,
             text='text'
         )
+        Follow.objects.create(user=cls.follower, author=cls.user)
         cls.client = Client()
+        cls.follower_client = Client()
+        cls.follower_client.force_login(cls.follower)
+        cls.urls = {
+            reverse('posts:index'): cls.client,
+            reverse('posts:group_posts', kwargs={'slug': cls.group.slug}):
+            cls.client,
+            reverse('posts:profile', kwargs={'username': cls.user.username}):
+            cls.client,
+            reverse('posts:follow_index'): cls.follower_client,
+        }
+
+    def setUp(self):
+        cache.clear()
 
     def test_page_uses_correct_template(self):
         """Кэширование страницы работает."""
-        response_1 = self.client.get(reverse('posts:index'))
-        CacheTests.post.delete()
-        response_2 = self.client.get(reverse('posts:index'))
-        self.assertEqual(
-            response_1.content,
-            response_2.content,
+        for url, client in self.urls.items():
+            with self.subTest(url=url):
+                response_1 = client.get(url)
+                Post.objects.filter(pk=self.post.pk).update(text='changed')
+                response_2 = client.get(url)
+                Post.objects.filter(pk=self.post.pk).update(text='text')
+                self.assertEqual(response_1.content, response_2.content)
+
+    def test_new_post_invalidates_feeds(self):
+        """Новый пост сразу появляется во всех лентах."""
+        responses = {url: client.get(url) for url, client in self.urls.items()}
+        Post.objects.create(
+            author=self.user,
+            group=self.group,
+            text='new text',
         )
-        cache.clear()
-        response_3 = self.client.get(reverse('posts:index'))
+        for url, client in self.urls.items():
+            with self.subTest(url=url):
+                response = client.get(url)
+                self.assertNotEqual(responses[url].content, response.content)
+                self.assertContains(response, 'new text')
+
+    def test_deleted_post_disappears(self):
+        """Удалённый пост сразу пропадает с главной страницы."""
+        post = Post.objects.create(author=self.user, text='to be deleted')
+        self.assertContains(self.client.get(reverse('posts:index')), post.text)
+        post.delete()
+        self.assertNotContains(
+            self.client.get(reverse('posts:index')), post.text
+        )
+
+    def test_group_change_invalidates_both_groups(self):
+        """Перенос поста в другую группу обновляет ленты обеих групп."""
+        other_group = Group.objects.create(
+            title='other',
+            slug='other',
+            description='description',
+        )
+        post = Post.objects.create(
+            author=self.user,
+            group=self.group,
+            text='moving post',
+        )
+        old_url = reverse('posts:group_posts', kwargs={'slug': 'slug'})
+        new_url = reverse('posts:group_posts', kwargs={'slug': 'other'})
+        self.assertContains(self.client.get(old_url), post.text)
+        self.assertNotContains(self.client.get(new_url), post.text)
+        post.group = other_group
+        post.save()
+        self.assertNotContains(self.client.get(old_url), post.text)
+        self.assertContains(self.client.get(new_url), post.text)
+
+    def test_group_and_comment_changes_bump_versions(self):
+        """Изменения групп и комментариев меняют версию фрагмента."""
+        url = reverse('posts:profile', kwargs={'username': 'auth'})
+        version = self.client.get(url).context['feed_cache_version']
+        self.group.title = 'new title'
+        self.group.save()
+        group_version = self.client.get(url).context['feed_cache_version']
+        self.assertNotEqual(version, group_version)
+        self.assertContains(self.client.get(url), 'new title')
+        Comment.objects.create(post=self.post, author=self.user, text='c')
         self.assertNotEqual(
-            response_1.content,
-            response_3.content,
+            group_version, self.client.get(url).context['feed_cache_version']
+        )
+
+
+class AnonymousPageCacheTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.group = Group.objects.create(
+            title='title',
+            slug='slug',
+            description='description',
+        )
+        cls.post = Post.objects.create(
+            author=cls.user,
+            group=cls.group,
+            text='text'
+        )
+        cls.guest_client = Client()
+        cls.authorized_client = Client()
+        cls.authorized_client.force_login(cls.user)
+        cls.urls = [
+            reverse('posts:index'),
+            reverse('posts:group_posts', kwargs={'slug': cls.group.slug}),
+            reverse('posts:profile', kwargs={'username': cls.user.username}),
+            reverse('posts:post_detail', kwargs={'post_id': cls.post.id}),
+        ]
+
+    def setUp(self):
+        cache.clear()
+
+    def test_anonymous_pages_are_served_without_queries(self):
+        """Повторный анонимный запрос не обращается к базе."""
+        for url in self.urls:
+            with self.subTest(url=url):
+                response = self.guest_client.get(url)
+                with self.assertNumQueries(0):
+                    cached_response = self.guest_client.get(url)
+                self.assertEqual(response.content, cached_response.content)
+
+    def test_authorized_pages_are_not_cached(self):
+        """Авторизованные пользователи получают страницу без кэша."""
+        for url in self.urls:
+            with self.subTest(url=url):
+                self.authorized_client.get(url)
+                response = self.authorized_client.get(url)
+                self.assertIsNotNone(response.context)
+
+    def test_signals_purge_cached_pages(self):
+        """Новый комментарий и новый пост сбрасывают кэш страниц."""
+        detail_url = reverse(
+            'posts:post_detail', kwargs={'post_id': self.post.id}
+        )
+        self.guest_client.get(detail_url)
+        self.guest_client.get(self.urls[0])
+        Comment.objects.create(post=self.post, author=self.user, text='c')
+        Post.objects.create(author=self.user, text='new text')
+        self.assertIsNotNone(self.guest_client.get(detail_url).context)
+        self.assertContains(self.guest_client.get(self.urls[0]), 'new text')
+
+    def test_stale_page_is_served_while_rebuilding(self):
+        """Пока страницу пересобирает другой запрос, отдаётся старая копия."""
+        url = self.urls[0]
+        key = KEY.format(hashlib.md5(url.encode()).hexdigest())
+        self.guest_client.get(url)
+        Post.objects.create(author=self.user, text='new text')
+        stale_cache.acquire(key)
+        self.assertNotContains(self.guest_client.get(url), 'new text')
+        stale_cache.release(key)
+        self.assertContains(self.guest_client.get(url), 'new text')
+
+
+class PostCardCacheTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.group = Group.objects.create(
+            title='title',
+            slug='slug',
+            description='description',
+        )
+        cls.post = Post.objects.create(
+            author=cls.user,
+            group=cls.group,
+            text='first text',
+        )
+        cls.other_post = Post.objects.create(author=cls.user, text='other')
+        cls.client = Client()
+        cls.client.force_login(cls.user)
+        cls.index_url = reverse('posts:index')
+        cls.profile_url = reverse('posts:profile', kwargs={'username': 'auth'})
+
+    def setUp(self):
+        cache.clear()
+
+    def test_cards_are_reused_when_page_is_rebuilt(self):
+        """Пересборка страницы берёт неизменённые карточки из кэша."""
+        self.client.get(self.index_url)
+        Post.objects.filter(pk=self.other_post.pk).update(text='changed')
+        object_cache.forget_posts([self.other_post.pk])
+        Post.objects.create(author=self.user, text='new text')
+        response = self.client.get(self.index_url)
+        self.assertContains(response, 'new text')
+        self.assertContains(response, 'other')
+        self.assertNotContains(response, 'changed')
+
+    def test_changes_rerender_cards(self):
+        """Правка поста, комментарий и переименование группы обновляют
+        карточку."""
+        self.client.get(self.index_url)
+        self.client.get(self.profile_url)
+        post = Post.objects.get(pk=self.post.pk)
+        post.text = 'edited text'
+        post.save()
+        Comment.objects.create(post=post, author=self.user, text='c')
+        group = Group.objects.get(pk=self.group.pk)
+        group.title = 'new title'
+        group.save()
+        response = self.client.get(self.index_url)
+        self.assertContains(response, 'edited text')
+        self.assertContains(response, 'Комментариев: 1')
+        self.assertContains(self.client.get(self.profile_url), 'new title')
+
+    def test_author_rename_rerenders_pages(self):
+        """Переименование автора обновляет ленты, профиль и страницу поста,
+        а другие изменения пользователя не трогают его посты."""
+        post_url = reverse(
+            'posts:post_detail', kwargs={'post_id': self.post.pk}
         )
+        anonymous = Client()
+        for url in (self.index_url, self.profile_url, post_url):
+            self.client.get(url)
+            anonymous.get(url)
+        updated = Post.objects.get(pk=self.post.pk).updated
+        user = User.objects.get(pk=self.user.pk)
+        user.set_password('new password')
+        user.save()
+        self.assertEqual(Post.objects.get(pk=self.post.pk).updated, updated)
+        user.first_name = 'Renamed'
+        user.username = 'renamed'
+        user.save()
+        self.assertEqual(Post.objects.get(pk=self.post.pk).updated, updated)
+        profile_url = reverse('posts:profile', kwargs={'username': 'renamed'})
+        for client in (self.client, anonymous):
+            for url, text in ((self.index_url, 'Автор: Renamed'),
+                              (profile_url, 'Автор: Renamed'),
+                              (post_url, 'Автор: renamed')):
+                with self.subTest(url=url):
+                    self.assertContains(client.get(url), text)
@@ -0,0 +1,102 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Comment, Follow, Post, UserCounters
+
+User = get_user_model()
+
+
+class CountersTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.follower = User.objects.create_user(username='follower')
+
+    def setUp(self):
+        cache.clear()
+
+    def get_counters(self, user):
+        counters = UserCounters.objects.get(user=user)
+        return (
+            counters.posts_count,
+            counters.followers_count,
+            counters.following_count,
+        )
+
+    def test_counters_follow_creates_and_deletes(self):
+        """Счётчики меняются при создании и удалении объектов."""
+        post = Post.objects.create(author=self.author, text='text')
+        comment = Comment.objects.create(
+            post=post, author=self.follower, text='comment'
+        )
+        follow = Follow.objects.create(user=self.follower, author=self.author)
+        self.assertEqual(self.get_counters(self.author), (1, 1, 0))
+        self.assertEqual(self.get_counters(self.follower), (0, 0, 1))
+        self.assertEqual(Post.objects.get(pk=post.pk).comments_count, 1)
+        comment.delete()
+        follow.delete()
+        post.delete()
+        self.assertEqual(self.get_counters(self.author), (0, 0, 0))
+        self.assertEqual(self.get_counters(self.follower), (0, 0, 0))
+
+    def test_pages_show_counters(self):
+        """Профиль и пост показывают счётчики без подсчёта агрегатов."""
+        post = Post.objects.create(author=self.author, text='text')
+        Comment.objects.create(post=post, author=self.follower, text='c')
+        Follow.objects.create(user=self.follower, author=self.author)
+        response = Client().get(
+            reverse('posts:profile', kwargs={'username': 'author'})
+        )
+        self.assertEqual(response.context['post_number'], 1)
+        self.assertEqual(response.context['counters'].followers_count, 1)
+        self.assertContains(response, 'Комментариев: 1')
+        response = Client().get(
+            reverse('posts:post_detail', kwargs={'post_id': post.pk})
+        )
+        self.assertEqual(response.context['post_number'], 1)
+
+    def test_deleting_user_keeps_counters_consistent(self):
+        """Удаление пользователя уменьшает счётчики остальных."""
+        user = User.objects.create_user(username='user')
+        Post.objects.create(author=user, text='text')
+        Follow.objects.create(user=user, author=self.author)
+        user.delete()
+        self.assertEqual(self.get_counters(self.author), (0, 0, 0))
+
+    def test_edit_keeps_concurrent_comment_count(self):
+        """Редактирование поста не затирает счётчик комментариев,
+        изменившийся после того, как пост попал в кэш."""
+        post = Post.objects.create(author=self.author, text='text')
+        client = Client()
+        client.force_login(self.author)
+        url = reverse('posts:post_edit', kwargs={'post_id': post.pk})
+        stale = Post.objects.get(pk=post.pk)
+        Comment.objects.create(post=post, author=self.follower, text='c')
+        # Кэш объектов другого процесса ещё помнит пост без комментария.
+        cache.set(f'object:post:{post.pk}', stale)
+        client.post(url, {'text': 'edited'})
+        post.refresh_from_db()
+        self.assertEqual((post.text, post.comments_count), ('edited', 1))
+
+    def test_reconcile_counters_command(self):
+        """Команда reconcile_counters исправляет разошедшиеся счётчики."""
+        post = Post.objects.create(author=self.author, text='text')
+        Comment.objects.create(post=post, author=self.follower, text='c')
+        Follow.objects.create(user=self.follower, author=self.author)
+        UserCounters.objects.update(
+            posts_count=5, followers_count=5, following_count=5
+        )
+        UserCounters.objects.filter(user=self.follower).delete()
+        Post.objects.update(comments_count=0)
+        out = StringIO()
+        call_command('reconcile_counters', batch_size=1, stdout=out)
+        self.assertIn('пользователей: 2, постов: 1', out.getvalue())
+        self.assertEqual(self.get_counters(self.author), (1, 1, 0))
+        self.assertEqual(self.get_counters(self.follower), (0, 0, 1))
+        self.assertEqual(Post.objects.get(pk=post.pk).comments_count, 1)
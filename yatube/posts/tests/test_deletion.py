@@ -0,0 +1,149 @@
+import shutil
+import tempfile
+from io import StringIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from .. import deletion
+from ..models import (Comment, Follow, Group, Post, TimelineEntry,
+                      UserDeletion)
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class DeletionTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='title', slug='slug', description='description'
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        Follow.objects.create(user=cls.author, author=cls.reader)
+        cls.post = Post.objects.create(
+            author=cls.author,
+            group=cls.group,
+            text='author post',
+        )
+        for i in range(4):
+            Post.objects.create(author=cls.author, text=f'text {i}')
+        cls.reader_post = Post.objects.create(author=cls.reader, text='own')
+        Comment.objects.create(
+            post=cls.reader_post, author=cls.author, text='author comment'
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def tearDown(self):
+        # Скрытые авторы остаются в кэше после отката транзакции теста.
+        cache.clear()
+
+    def test_soft_delete_hides_content(self):
+        """Мягкое удаление сразу скрывает посты, комментарии и профиль."""
+        self.client.get(reverse('posts:index'))
+        deletion.soft_delete(self.author)
+        response = self.client.get(reverse('posts:index'))
+        self.assertEqual(list(response.context['page_obj']),
+                         [self.reader_post])
+        response = self.client.get(reverse(
+            'posts:group_posts', kwargs={'slug': self.group.slug}
+        ))
+        self.assertEqual(len(response.context['page_obj']), 0)
+        for url in (
+            reverse('posts:profile', kwargs={'username': 'author'}),
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}),
+        ):
+            with self.subTest(url=url):
+                self.assertEqual(self.client.get(url).status_code, 404)
+        response = self.client.get(reverse(
+            'posts:post_detail', kwargs={'post_id': self.reader_post.pk}
+        ))
+        self.assertNotContains(response, 'author comment')
+        self.client.force_login(self.reader)
+        response = self.client.get(reverse('posts:follow_index'))
+        self.assertEqual(len(response.context['page_obj']), 0)
+        self.assertFalse(User.objects.get(pk=self.author.pk).is_active)
+
+    def test_process_deletions_in_batches(self):
+        """Команда удаляет данные пачками и может быть запущена снова."""
+        image = Post.objects.create(
+            author=self.author,
+            text='image',
+            image=SimpleUploadedFile('small.gif', SMALL_GIF, 'image/gif'),
+        ).image
+        self.assertTrue(image.storage.exists(image.name))
+        deletion.soft_delete(self.author)
+        processed = deletion.process(self.author.pk, 2)
+        self.assertEqual(next(processed), 1)
+        self.assertEqual(next(processed), 2)
+        out = StringIO()
+        call_command('process_deletions', batch_size=2, stdout=out)
+        self.assertIn(f'Пользователь {self.author.pk} удалён', out.getvalue())
+        self.assertFalse(User.objects.filter(pk=self.author.pk).exists())
+        self.assertFalse(UserDeletion.objects.exists())
+        self.assertFalse(Post.objects.exclude(author=self.reader).exists())
+        self.assertFalse(Comment.objects.exists())
+        self.assertFalse(Follow.objects.exists())
+        self.assertFalse(TimelineEntry.objects.exists())
+        self.assertFalse(image.storage.exists(image.name))
+        self.assertEqual(
+            Post.objects.get(pk=self.reader_post.pk).comments_count, 0
+        )
+        self.assertEqual(self.reader.counters.followers_count, 0)
+        response = self.client.get(reverse('posts:index'))
+        self.assertEqual(list(response.context['page_obj']),
+                         [self.reader_post])
+
+    @override_settings(FEED_ID_CACHE_LENGTH=3, PAGINATOR_OBJECTS_PER_PAGE=5)
+    def test_process_deletions_keeps_feed_count(self):
+        """Удаление постов скрытого автора не уменьшает число постов в
+        лентах, собранных уже без них."""
+        for i in range(11):
+            Post.objects.create(author=self.reader, text=f'reader {i}')
+        deletion.soft_delete(self.author)
+        self.client.get(reverse('posts:index'))
+        call_command('process_deletions', batch_size=2, stdout=StringIO())
+        response = self.client.get(reverse('posts:index'))
+        self.assertEqual(response.context['page_obj'].paginator.count, 12)
+        response = self.client.get(reverse('posts:index') + '?page=2')
+        self.assertEqual(len(response.context['page_obj']), 5)
+
+    def test_admin_delete_is_soft(self):
+        """Удаление пользователя в админке только скрывает его."""
+        admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='pass'
+        )
+        self.client.force_login(admin)
+        url = reverse('admin:auth_user_delete', args=[self.author.pk])
+        response = self.client.get(url)
+        self.assertNotContains(response, 'author post')
+        self.client.post(url, {'post': 'yes'})
+        self.assertTrue(UserDeletion.objects.filter(user=self.author).exists())
+        self.assertEqual(Post.objects.filter(author=self.author).count(), 5)
@@ -0,0 +1,137 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache, caches
+from django.test import TestCase, override_settings
+
+from .. import feed_cache, id_cache
+from ..models import Group, Post
+from ..paginators import CursorPaginator, IdListPaginator
+
+User = get_user_model()
+
+
+@override_settings(FEED_ID_CACHE_LENGTH=5)
+class IdCacheTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(
+            title='title',
+            slug='slug',
+            description='description',
+        )
+        cls.other_group = Group.objects.create(
+            title='other',
+            slug='other',
+            description='description',
+        )
+        for i in range(8):
+            Post.objects.create(author=cls.author, group=cls.group, text=i)
+
+    def setUp(self):
+        cache.clear()
+
+    def get_paginator(self, feed=feed_cache.INDEX, queryset=None):
+        if queryset is None:
+            queryset = Post.objects.select_related('author', 'group')
+        return IdListPaginator(queryset, 3, feed=feed)
+
+    def get_ids(self, feed=feed_cache.INDEX):
+        return list(cache.get(id_cache.KEY.format(feed)).ids)
+
+    def test_pages_match_database(self):
+        """Страницы из кэша id совпадают со страницами из базы."""
+        cached = self.get_paginator()
+        plain = CursorPaginator(Post.objects.all(), 3)
+        self.assertEqual(cached.count, 8)
+        for number in (1, 2, 3):
+            with self.subTest(number=number):
+                self.assertEqual(
+                    list(cached.page(number)), list(plain.page(number))
+                )
+        page = cached.get_page(cursor=cached.next_cursor(cached.page(1)))
+        while page.has_next():
+            page = cached.get_page(cursor=page.next_cursor)
+        self.assertEqual(list(page), list(plain.page(3)))
+        page = cached.get_page(cursor=page.previous_cursor)
+        self.assertEqual(list(page), list(plain.page(2)))
+
+    def test_first_page_is_served_from_caches(self):
+        """Повторная первая страница не обращается к базе."""
+        list(self.get_paginator().page(1))
+        with self.assertNumQueries(0):
+            paginator = self.get_paginator()
+            self.assertEqual(len(paginator.page(1)), 3)
+            self.assertEqual(paginator.count, 8)
+
+    def test_new_post_updates_lists_in_place(self):
+        """Новый пост вставляется в начало списка без его пересборки."""
+        list(self.get_paginator().page(1))
+        post = Post.objects.create(author=self.author, text='new')
+        ids = self.get_ids()
+        self.assertEqual(ids[0], post.pk)
+        self.assertEqual(len(ids), 5)
+        self.assertEqual(cache.get(id_cache.KEY.format('index')).count, 9)
+        with self.assertNumQueries(1):
+            self.assertEqual(self.get_paginator().page(1)[0], post)
+
+    def test_delete_and_group_change_update_lists(self):
+        """Удаление и перенос поста меняют только затронутые списки."""
+        group_feed = feed_cache.group_feed(self.group.pk)
+        other_feed = feed_cache.group_feed(self.other_group.pk)
+        list(self.get_paginator().page(1))
+        for feed, group in ((group_feed, self.group),
+                            (other_feed, self.other_group)):
+            list(self.get_paginator(feed, group.posts.all()).page(1))
+        first, second = self.get_ids(group_feed)[:2]
+        Post.objects.get(pk=first).delete()
+        moved = Post.objects.get(pk=second)
+        moved.group = self.other_group
+        moved.save()
+        self.assertNotIn(first, self.get_ids())
+        self.assertNotIn(first, self.get_ids(group_feed))
+        self.assertNotIn(second, self.get_ids(group_feed))
+        self.assertEqual(self.get_ids(other_feed), [second])
+        self.assertEqual(
+            list(self.get_paginator(group_feed, self.group.posts.all())
+                 .page(1)),
+            list(self.group.posts.order_by('-pub_date', '-pk')[:3]),
+        )
+
+    def test_update_reads_shared_list(self):
+        """Изменение списка не опирается на устаревшую копию в L1."""
+        list(self.get_paginator().page(1))
+        key = id_cache.KEY.format(feed_cache.INDEX)
+        newest = id_cache.to_key(Post.objects.latest('pub_date').pub_date, 0)
+        # Другой процесс вставил пост 1001: L1 этого процесса о нём
+        # ещё не знает.
+        entry = caches['l2'].get(key)
+        entry.insert((newest[0] + 1, 1001), 5)
+        caches['l2'].set(key, entry)
+        id_cache.update(
+            [feed_cache.INDEX],
+            lambda entry: entry.insert((newest[0] + 2, 1002), 5),
+        )
+        entry = caches['l2'].get(key)
+        self.assertEqual(list(entry.ids)[:2], [1002, 1001])
+        self.assertEqual(entry.count, 10)
+
+    def test_update_during_load_discards_list(self):
+        """Список, собранный во время изменения ленты, не сохраняется."""
+        post = Post.objects.create(author=self.author, text='new')
+        queryset = Post.objects.exclude(pk=post.pk)
+
+        class Racing:
+            def values_list(self, *fields):
+                rows = queryset.values_list(*fields)
+                id_cache.add_post(post, [feed_cache.INDEX])
+                return rows
+
+            def count(self):
+                return queryset.count()
+
+        cache.clear()
+        entry = id_cache.load(feed_cache.INDEX, Racing())
+        self.assertNotIn(post.pk, entry.ids)
+        self.assertIsNone(cache.get(id_cache.KEY.format(feed_cache.INDEX)))
+        self.assertIn(post, self.get_paginator().page(1).object_list)
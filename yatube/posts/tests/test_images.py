@@ -0,0 +1,180 @@
+import shutil
+import tempfile
+from io import BytesIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+
+from .. import images, thumbnails
+from ..models import Post
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+def make_photo(size, orientation):
+    exif = Image.Exif()
+    exif[0x0112] = orientation
+    buffer = BytesIO()
+    Image.new('RGB', size, 'red').save(
+        buffer, 'JPEG', quality=100, exif=exif.tobytes()
+    )
+    return SimpleUploadedFile('photo.jpeg', buffer.getvalue(), 'image/jpeg')
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ImageFieldsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.author)
+
+    def get_fields(self, post):
+        return Post.objects.filter(pk=post.pk).values_list(*images.FIELDS)[0]
+
+    def test_fields_are_filled_on_upload(self):
+        """Размеры картинки записываются при загрузке и сбрасываются при
+        её удалении."""
+        self.client.post(reverse('posts:post_create'), {
+            'text': 'text',
+            'image': SimpleUploadedFile('new.gif', SMALL_GIF, 'image/gif'),
+        })
+        post = Post.objects.get()
+        self.assertEqual(self.get_fields(post), (2, 1, len(SMALL_GIF), 'GIF'))
+        url = reverse('posts:post_edit', kwargs={'post_id': post.pk})
+        self.client.post(url, {'text': 'edited'})
+        self.assertEqual(self.get_fields(post), (2, 1, len(SMALL_GIF), 'GIF'))
+        self.client.post(url, {'text': 'edited', 'image-clear': 'on'})
+        self.assertEqual(self.get_fields(post), (None, None, None, ''))
+
+    @override_settings(POST_IMAGE_MAX_SIZE=600)
+    def test_large_photo_is_downscaled(self):
+        """Большой снимок уменьшается, поворачивается по EXIF и хранится
+        без EXIF."""
+        photo = make_photo((1200, 800), orientation=6)
+        self.client.post(reverse('posts:post_create'), {
+            'text': 'text',
+            'image': photo,
+        })
+        post = Post.objects.get()
+        self.assertEqual(post.image.name, 'posts/photo.jpg')
+        width, height, size, image_format = self.get_fields(post)
+        self.assertEqual((width, height, image_format), (400, 600, 'JPEG'))
+        self.assertLess(size, photo.size)
+        with Image.open(post.image.path) as image:
+            self.assertEqual(image.size, (400, 600))
+            self.assertNotIn('exif', image.info)
+
+    def test_exif_is_stripped_from_transparent_image(self):
+        """Картинка с прозрачностью хранится в PNG без EXIF."""
+        exif = Image.Exif()
+        exif[0x010F] = 'SecretCam'
+        buffer = BytesIO()
+        Image.new('RGBA', (500, 100)).save(
+            buffer, 'PNG', exif=exif.tobytes()
+        )
+        upload = SimpleUploadedFile('logo.png', buffer.getvalue(), 'image/png')
+        data = images.normalize(upload).read()
+        with Image.open(BytesIO(data)) as image:
+            self.assertEqual(image.format, 'PNG')
+            image.load()
+            self.assertNotIn('exif', image.info)
+            self.assertEqual(dict(image.getexif()), {})
+
+    @override_settings(POST_IMAGE_MAX_SIZE=600)
+    def test_large_animation_is_downscaled(self):
+        """Каждый кадр большой анимации уменьшается, EXIF убирается."""
+        exif = Image.Exif()
+        exif[0x010F] = 'SecretCam'
+        for image_format, params in (('GIF', {}), ('PNG', {
+            'exif': exif.tobytes()
+        })):
+            with self.subTest(image_format=image_format):
+                buffer = BytesIO()
+                frames = [Image.new('RGB', (4000, 3000), color)
+                          for color in ('red', 'blue')]
+                frames[0].save(
+                    buffer, image_format, save_all=True,
+                    append_images=frames[1:], duration=[100, 200], **params
+                )
+                upload = SimpleUploadedFile(
+                    f'anim.{image_format.lower()}', buffer.getvalue()
+                )
+                data = images.normalize(upload).read()
+                with Image.open(BytesIO(data)) as image:
+                    self.assertEqual(image.format, image_format)
+                    self.assertEqual(image.size, (600, 450))
+                    self.assertEqual(image.n_frames, 2)
+                    image.load()
+                    self.assertEqual(dict(image.getexif()), {})
+
+    @override_settings(THUMBNAIL_MAX_PIXELS=100)
+    def test_too_large_image_is_rejected(self):
+        """Картинку больше THUMBNAIL_MAX_PIXELS форма не принимает."""
+        response = self.client.post(reverse('posts:post_create'), {
+            'text': 'text',
+            'image': make_photo((20, 10), orientation=1),
+        })
+        self.assertFormError(
+            response, 'form', 'image',
+            'Картинка слишком большая: не больше 100 пикселей.',
+        )
+        self.assertFalse(Post.objects.exists())
+
+    def test_backfill(self):
+        """Команда заполняет поля у постов, загруженных без них."""
+        post = Post.objects.create(
+            author=self.author,
+            text='text',
+            image=SimpleUploadedFile('old.gif', SMALL_GIF, 'image/gif'),
+        )
+        Post.objects.filter(pk=post.pk).update(
+            image_width=None, image_height=None, image_size=None,
+            image_format='',
+        )
+        self.assertEqual(list(images.backfill(10)), [1])
+        self.assertEqual(self.get_fields(post), (2, 1, len(SMALL_GIF), 'GIF'))
+        self.assertEqual(list(images.backfill(10)), [])
+
+    def test_thumbnail_size(self):
+        """Размер миниатюры считается по сохранённым полям."""
+        post = Post(image_width=1000, image_height=500)
+        self.assertEqual(
+            thumbnails.thumbnail_size(
+                post, '960x339', crop='center', upscale=True
+            ),
+            (960, 339),
+        )
+        self.assertEqual(
+            thumbnails.thumbnail_size(post, '100x100'), (100, 50)
+        )
+        self.assertEqual(
+            thumbnails.thumbnail_size(post, '2000x2000', upscale=False),
+            (1000, 500),
+        )
+        self.assertIsNone(thumbnails.thumbnail_size(Post(), '100x100'))
@@ -0,0 +1,73 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.http import Http404
+from django.test import TestCase
+
+from .. import object_cache
+from ..models import Group, Post
+
+User = get_user_model()
+
+
+class ObjectCacheTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.group = Group.objects.create(
+            title='title',
+            slug='slug',
+            description='description',
+        )
+        cls.post = Post.objects.create(
+            author=cls.user,
+            group=cls.group,
+            text='text',
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_objects_are_read_through(self):
+        """Повторное чтение объектов не обращается к базе."""
+        object_cache.get_post_or_404(self.post.pk)
+        object_cache.get_group_or_404('slug')
+        object_cache.get_user_or_404('auth')
+        with self.assertNumQueries(0):
+            post = object_cache.get_post_or_404(self.post.pk)
+            self.assertEqual(post.author, self.user)
+            self.assertEqual(post.group, self.group)
+            self.assertEqual(object_cache.get_group_or_404('slug'), self.group)
+            self.assertEqual(object_cache.get_user_or_404('auth'), self.user)
+
+    def test_missing_objects_raise_404(self):
+        """Несуществующие объекты дают 404."""
+        for getter, value in ((object_cache.get_post_or_404, 0),
+                              (object_cache.get_group_or_404, 'missing'),
+                              (object_cache.get_user_or_404, 'missing')):
+            with self.subTest(getter=getter.__name__):
+                with self.assertRaises(Http404):
+                    getter(value)
+
+    def test_changes_invalidate_objects(self):
+        """Изменение объекта, его группы или автора сбрасывает кэш."""
+        object_cache.get_post_or_404(self.post.pk)
+        object_cache.get_group_or_404('slug')
+        group = Group.objects.get(pk=self.group.pk)
+        group.title = 'new title'
+        group.slug = 'new-slug'
+        group.save()
+        user = User.objects.get(pk=self.user.pk)
+        user.first_name = 'Name'
+        user.save()
+        post = object_cache.get_post_or_404(self.post.pk)
+        self.assertEqual(post.group.title, 'new title')
+        self.assertEqual(post.author.first_name, 'Name')
+        self.assertEqual(
+            object_cache.get_group_or_404('new-slug').title, 'new title'
+        )
+        with self.assertRaises(Http404):
+            object_cache.get_group_or_404('slug')
+        Post.objects.get(pk=self.post.pk).delete()
+        with self.assertRaises(Http404):
+            object_cache.get_post_or_404(self.post.pk)
@@ -0,0 +1,90 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+PAGE_SIZES = (1, 10)
+
+
+class QueryBudgetMixin:
+    """Проверка того, что страница укладывается в бюджет запросов и число
+    запросов не растёт с размером страницы."""
+
+    def count_queries(self, client, url):
+        cache.clear()
+        with CaptureQueriesContext(connection) as context:
+            client.get(url)
+        return [query['sql'] for query in context.captured_queries]
+
+    def assert_query_budget(self, client, url, budget):
+        counts = {}
+        for page_size in PAGE_SIZES:
+            with override_settings(PAGINATOR_OBJECTS_PER_PAGE=page_size):
+                queries = self.count_queries(client, url)
+            with self.subTest(url=url, page_size=page_size):
+                self.assertLessEqual(
+                    len(queries), budget, msg='\n'.join(queries)
+                )
+            counts[page_size] = len(queries)
+        with self.subTest(url=url, counts=counts):
+            self.assertEqual(len(set(counts.values())), 1)
+
+
+class QueryBudgetTests(QueryBudgetMixin, TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.follower = User.objects.create_user(username='follower')
+        cls.group = Group.objects.create(
+            title='title',
+            slug='slug',
+            description='description',
+        )
+        cls.authors = [
+            User.objects.create_user(
+                username=f'author_{i}',
+                first_name=f'first_name_{i}',
+            )
+            for i in range(10)
+        ]
+        for author in cls.authors:
+            Follow.objects.create(user=cls.follower, author=author)
+            cls.post = Post.objects.create(
+                author=author,
+                group=cls.group,
+                text='text',
+            )
+        for author in cls.authors:
+            Comment.objects.create(post=cls.post, author=author, text='text')
+        cls.follower_client = Client()
+        cls.follower_client.force_login(cls.follower)
+        cls.author_client = Client()
+        cls.author_client.force_login(cls.post.author)
+
+    def test_feeds_query_budget(self):
+        """Ленты укладываются в бюджет запросов."""
+        # В каждый бюджет входит чтение скрытых авторов при пустом кэше.
+        budgets = {
+            reverse('posts:index'): 5,
+            reverse('posts:group_posts', kwargs={'slug': self.group.slug}):
+            6,
+            reverse('posts:profile', kwargs={
+                'username': self.post.author.username
+            }): 7,
+            reverse('posts:follow_index'): 6,
+        }
+        for url, budget in budgets.items():
+            self.assert_query_budget(self.follower_client, url, budget)
+
+    def test_post_detail_query_budget(self):
+        """Страница поста не запрашивает авторов комментариев по одному."""
+        url = reverse('posts:post_detail', kwargs={'post_id': self.post.id})
+        with CaptureQueriesContext(connection) as context:
+            self.author_client.get(url)
+        self.assertLessEqual(len(context), 5)
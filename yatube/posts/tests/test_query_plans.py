@@ -0,0 +1,95 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class QueryPlanTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.follower = User.objects.create_user(username='follower')
+        cls.group = Group.objects.create(
+            title='title',
+            slug='slug',
+            description='description',
+        )
+        for i in range(15):
+            cls.post = Post.objects.create(
+                author=cls.user,
+                group=cls.group,
+                text=f'text_{i}',
+            )
+        Comment.objects.create(post=cls.post, author=cls.user, text='text')
+        Follow.objects.create(user=cls.follower, author=cls.user)
+        cls.author_client = Client()
+        cls.author_client.force_login(cls.user)
+        cls.follower_client = Client()
+        cls.follower_client.force_login(cls.follower)
+
+    def get_query_plans(self, client, url, data=None):
+        cache.clear()
+        with CaptureQueriesContext(connection) as context:
+            client.get(url, data)
+        plans = []
+        with connection.cursor() as cursor:
+            for query in context.captured_queries:
+                if not query['sql'].startswith('SELECT'):
+                    continue
+                cursor.execute('EXPLAIN QUERY PLAN ' + query['sql'])
+                plans.append((
+                    query['sql'],
+                    [row[-1] for row in cursor.fetchall()],
+                ))
+        return plans
+
+    def assert_no_full_scans(self, plans):
+        for sql, details in plans:
+            for detail in details:
+                with self.subTest(sql=sql, detail=detail):
+                    self.assertNotIn('TEMP B-TREE', detail)
+                    # Подзапрос с LIMIT ограничен, его перебор — не
+                    # сканирование таблицы. Таблица скрытых авторов
+                    # читается целиком: в ней только ждущие удаления.
+                    if (detail.startswith('SCAN') and detail not in (
+                            'SCAN subquery', 'SCAN posts_userdeletion')):
+                        self.assertIn('USING', detail)
+
+    def test_feeds_use_indexes(self):
+        """Запросы лент не сканируют таблицы и не сортируют во временном
+        B-tree."""
+        urls = {
+            reverse('posts:index'): self.author_client,
+            reverse('posts:group_posts', kwargs={'slug': self.group.slug}):
+            self.author_client,
+            reverse('posts:profile', kwargs={'username': self.user.username}):
+            self.author_client,
+            reverse('posts:follow_index'): self.follower_client,
+        }
+        for url, client in urls.items():
+            with self.subTest(url=url):
+                self.check_feed(client, url)
+
+    def check_feed(self, client, url):
+        first_page = self.get_query_plans(client, url)
+        self.assertTrue(first_page)
+        self.assert_no_full_scans(first_page)
+        page_obj = client.get(url).context['page_obj']
+        cursor = page_obj.paginator.next_cursor(page_obj)
+        self.assert_no_full_scans(
+            self.get_query_plans(client, url, {'cursor': cursor})
+        )
+
+    def test_post_detail_uses_indexes(self):
+        """Запросы страницы поста используют индексы."""
+        url = reverse('posts:post_detail', kwargs={'post_id': self.post.id})
+        plans = self.get_query_plans(self.author_client, url)
+        self.assertTrue(any('posts_comment' in sql for sql, _ in plans))
+        self.assert_no_full_scans(plans)
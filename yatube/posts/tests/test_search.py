@@ -0,0 +1,91 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from .. import search
+from ..models import Post
+
+User = get_user_model()
+
+
+class SearchTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='pass'
+        )
+        cls.posts = [
+            Post.objects.create(author=cls.author, text=text)
+            for text in (
+                'Кошка спит на окне',
+                'Кошки и кошка <b>дома</b>',
+                'Собака гуляет',
+            )
+        ]
+
+    def setUp(self):
+        cache.clear()
+
+    def get_ids(self, query, limit=10, cursor=None):
+        page = search.search(query, limit, cursor)
+        return [result.post.pk for result in page], page
+
+    def test_search_ranks_and_highlights(self):
+        """Поиск находит посты по префиксу слова и подсвечивает его."""
+        ids, page = self.get_ids('кошк')
+        self.assertEqual(set(ids), {self.posts[0].pk, self.posts[1].pk})
+        self.assertEqual(ids[0], self.posts[1].pk)
+        snippet = page.results[0].snippet
+        self.assertIn('<mark>Кошки</mark>', snippet)
+        self.assertIn('&lt;b&gt;', snippet)
+        self.assertEqual(self.get_ids('кошка собака')[0], [])
+        self.assertEqual(self.get_ids('"*) OR (')[0], [])
+
+    def test_keyset_pages_cover_results(self):
+        """Курсор листает результаты без пропусков и повторов."""
+        first, page = self.get_ids('кошка', limit=1)
+        self.assertTrue(page.has_next())
+        second, page = self.get_ids('кошка', limit=1, cursor=page.next_cursor)
+        self.assertFalse(page.has_next())
+        self.assertEqual(first + second, self.get_ids('кошка')[0])
+
+    def test_index_follows_posts(self):
+        """Индекс обновляется при изменении и удалении поста."""
+        post = self.posts[2]
+        post.text = 'Собака спит'
+        post.save()
+        self.assertEqual(self.get_ids('гуляет')[0], [])
+        self.assertEqual(self.get_ids('спит собака')[0], [post.pk])
+        post.delete()
+        self.assertEqual(self.get_ids('собака')[0], [])
+
+    def test_rebuild_command(self):
+        """Команда пересобирает индекс по таблице постов."""
+        with connection.cursor() as db:
+            db.execute(f'DELETE FROM {search.TABLE}')
+        out = StringIO()
+        call_command('rebuild_search_index', stdout=out)
+        self.assertIn('3', out.getvalue())
+        self.assertEqual(len(self.get_ids('кошка')[0]), 2)
+
+    def test_search_page_and_admin(self):
+        """Страница поиска и поиск в админке используют индекс."""
+        response = Client().get(reverse('posts:post_search'), {'q': 'собак'})
+        self.assertContains(response, '<mark>Собака</mark>')
+        self.assertNotContains(response, 'Кошка')
+        client = Client()
+        client.force_login(self.admin)
+        response = client.get(
+            reverse('admin:posts_post_changelist'), {'q': 'кошка'}
+        )
+        self.assertEqual(
+            set(response.context['cl'].result_list),
+            set(self.posts[:2]),
+        )
@@ -0,0 +1,146 @@
+import os
+import shutil
+import tempfile
+from concurrent.futures import Future
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache, caches
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client, TestCase, override_settings
+from django.templatetags.static import static
+from django.urls import reverse
+
+from .. import thumbnail_worker, thumbnails
+from ..models import Post
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+TEMP_CACHE_DIR = tempfile.mkdtemp()
+
+# Хранилище миниатюр на SQLite, как на сайте, но во временном файле.
+CACHES = {
+    **settings.CACHES,
+    'shared': {
+        **settings.SHARED_CACHE,
+        'LOCATION': os.path.join(TEMP_CACHE_DIR, 'cache.sqlite3'),
+    },
+}
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+class FakeExecutor:
+    def __init__(self):
+        self.jobs = []
+
+    def submit(self, function, *args):
+        future = Future()
+        self.jobs.append((future, function, args))
+        return future
+
+    def run(self):
+        for future, function, args in self.jobs:
+            try:
+                future.set_result(function(*args))
+            except Exception as error:
+                future.set_exception(error)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, CACHES=CACHES)
+class ThumbnailTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+        shutil.rmtree(TEMP_CACHE_DIR, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        caches[settings.THUMBNAIL_CACHE].clear()
+        self.client = Client()
+        self.client.force_login(self.author)
+
+    def create_post(self, name):
+        return Post.objects.create(
+            author=self.author,
+            text='text',
+            image=SimpleUploadedFile(name, SMALL_GIF, 'image/gif'),
+        )
+
+    def get_image_url(self, post):
+        return thumbnails.get_thumbnail(
+            post, '960x339', crop='center', upscale=True
+        ).url
+
+    def test_thumbnails_are_built_when_post_is_created(self):
+        """Миниатюры строятся при создании поста, а не при показе."""
+        with mock.patch.object(
+            thumbnail_worker, 'generate', wraps=thumbnail_worker.generate
+        ) as generate:
+            self.client.post(reverse('posts:post_create'), {
+                'text': 'text',
+                'image': SimpleUploadedFile('new.gif', SMALL_GIF, 'image/gif'),
+            })
+            post = Post.objects.get()
+            self.assertEqual(generate.call_count, 1)
+            self.assertIn('/cache/', self.get_image_url(post))
+            self.assertEqual(generate.call_count, 1)
+
+    def test_placeholder_until_worker_finishes(self):
+        """Пока пул строит миниатюру, шаблон показывает заглушку, а готовая
+        миниатюра меняет updated поста."""
+        post = self.create_post('pool.gif')
+        executor = FakeExecutor()
+        url = reverse('posts:post_detail', kwargs={'post_id': post.pk})
+        with mock.patch.object(thumbnails, 'uses_workers', return_value=True):
+            with mock.patch.object(
+                thumbnails, 'get_executor', return_value=executor
+            ):
+                response = self.client.get(url)
+                self.assertContains(response, settings.THUMBNAIL_PLACEHOLDER)
+                self.get_image_url(post)
+        self.assertEqual(len(executor.jobs), 1)
+        executor.run()
+        self.assertGreater(Post.objects.get(pk=post.pk).updated, post.updated)
+        response = self.client.get(url)
+        self.assertNotContains(response, settings.THUMBNAIL_PLACEHOLDER)
+        self.assertIn('/cache/', self.get_image_url(post))
+
+    def test_failed_thumbnails_are_not_retried(self):
+        """Картинку, миниатюры которой не удалось построить, какое-то
+        время не ставят в очередь снова."""
+        placeholder = static(settings.THUMBNAIL_PLACEHOLDER)
+        failing = mock.patch.object(
+            thumbnail_worker, 'generate', side_effect=OSError('broken')
+        )
+        post = self.create_post('sync.gif')
+        with failing as generate, self.assertLogs('posts.thumbnails'):
+            self.assertEqual(self.get_image_url(post), placeholder)
+            self.assertEqual(self.get_image_url(post), placeholder)
+        self.assertEqual(generate.call_count, 1)
+        post = self.create_post('pool.gif')
+        executor = FakeExecutor()
+        with mock.patch.object(thumbnails, 'uses_workers', return_value=True):
+            with mock.patch.object(
+                thumbnails, 'get_executor', return_value=executor
+            ):
+                with failing, self.assertLogs('posts.thumbnails'):
+                    self.get_image_url(post)
+                    executor.run()
+                    self.assertEqual(self.get_image_url(post), placeholder)
+        self.assertEqual(len(executor.jobs), 1)
@@ -0,0 +1,148 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from ..models import Follow, Post, PulledAuthor, TimelineEntry
+
+User = get_user_model()
+
+
+class TimelineTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.follower = User.objects.create_user(username='follower')
+        cls.old_post = Post.objects.create(author=cls.author, text='old')
+
+    def setUp(self):
+        self.follower_client = Client()
+        self.follower_client.force_login(self.follower)
+
+    def get_feed(self):
+        response = self.follower_client.get(reverse('posts:follow_index'))
+        return list(response.context['page_obj'])
+
+    def follow(self):
+        self.follower_client.get(reverse(
+            'posts:profile_follow',
+            kwargs={'username': self.author.username}
+        ))
+
+    def test_follow_backfills_timeline(self):
+        """Подписка добавляет в ленту уже опубликованные посты автора."""
+        self.follow()
+        self.assertEqual(self.get_feed(), [self.old_post])
+
+    def test_new_post_is_pushed_to_followers(self):
+        """Новый пост попадает в ленты подписчиков автора."""
+        self.follow()
+        new_post = Post.objects.create(author=self.author, text='new')
+        self.assertEqual(self.get_feed(), [new_post, self.old_post])
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=self.follower,
+            post=new_post,
+            pub_date=new_post.pub_date,
+        ).exists())
+
+    def test_unfollow_prunes_timeline(self):
+        """Отписка убирает посты автора из ленты."""
+        self.follow()
+        self.follower_client.get(reverse(
+            'posts:profile_unfollow',
+            kwargs={'username': self.author.username}
+        ))
+        self.assertEqual(self.get_feed(), [])
+        self.assertFalse(TimelineEntry.objects.exists())
+
+    def test_rebuild_timelines_command(self):
+        """Команда rebuild_timelines восстанавливает ленты с нуля."""
+        Follow.objects.create(user=self.follower, author=self.author)
+        TimelineEntry.objects.all().delete()
+        out = StringIO()
+        call_command('rebuild_timelines', stdout=out)
+        self.assertIn('1', out.getvalue())
+        self.assertEqual(self.get_feed(), [self.old_post])
+
+
+@override_settings(
+    TIMELINE_FANOUT_FOLLOWERS_LIMIT=3,
+    TIMELINE_PUSH_FOLLOWERS_LIMIT=2,
+    PAGINATOR_OBJECTS_PER_PAGE=2,
+)
+class HybridTimelineTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.star = User.objects.create_user(username='star')
+        cls.author = User.objects.create_user(username='author')
+        cls.follower = User.objects.create_user(username='follower')
+        cls.another_follower = User.objects.create_user(username='another')
+        cls.third_follower = User.objects.create_user(username='third')
+
+    def setUp(self):
+        Follow.objects.create(user=self.follower, author=self.author)
+        Follow.objects.create(user=self.follower, author=self.star)
+        Follow.objects.create(user=self.another_follower, author=self.star)
+        Follow.objects.create(user=self.third_follower, author=self.star)
+        self.posts = [
+            Post.objects.create(
+                author=(self.star, self.author)[i % 2],
+                text=f'text_{i}',
+            )
+            for i in range(5)
+        ]
+        self.follower_client = Client()
+        self.follower_client.force_login(self.follower)
+
+    def get_page(self, data=None):
+        response = self.follower_client.get(
+            reverse('posts:follow_index'), data
+        )
+        return response.context['page_obj']
+
+    def test_popular_author_is_pulled(self):
+        """Посты популярного автора не раскладываются по лентам."""
+        self.assertTrue(PulledAuthor.objects.filter(author=self.star).exists())
+        self.assertFalse(
+            TimelineEntry.objects.filter(author=self.star).exists()
+        )
+
+    def test_merged_feed_pagination(self):
+        """Лента сливает push- и pull-авторов в порядке публикации."""
+        expected = self.posts[::-1]
+        first_page = self.get_page()
+        self.assertEqual(first_page.paginator.count, 5)
+        self.assertEqual(list(first_page), expected[:2])
+        self.assertEqual(list(self.get_page({'page': 2})), expected[2:4])
+        cursor_page = self.get_page(
+            {'cursor': first_page.paginator.next_cursor(first_page)}
+        )
+        self.assertEqual(list(cursor_page), expected[2:4])
+        last_page = self.get_page({'cursor': cursor_page.next_cursor})
+        self.assertEqual(list(last_page), expected[4:])
+        self.assertFalse(last_page.has_next())
+        back_page = self.get_page({'cursor': last_page.previous_cursor})
+        self.assertEqual(list(back_page), expected[2:4])
+
+    def test_author_below_limit_is_pushed_again(self):
+        """Автор возвращается к раскладке командой и только когда
+        подписчиков меньше нижнего порога; ленты дозаполняются."""
+        Follow.objects.filter(user=self.third_follower).delete()
+        call_command('demote_pulled_authors', stdout=StringIO())
+        self.assertTrue(PulledAuthor.objects.exists())
+        Follow.objects.filter(user=self.another_follower).delete()
+        self.assertTrue(PulledAuthor.objects.exists())
+        with override_settings(TIMELINE_BATCH_SIZE=1):
+            call_command('demote_pulled_authors', stdout=StringIO())
+        self.assertFalse(PulledAuthor.objects.exists())
+        self.assertEqual(
+            TimelineEntry.objects.filter(
+                user=self.follower, author=self.star
+            ).count(),
+            3,
+        )
+        self.assertEqual(self.get_page().paginator.count, 5)
@@ -38,6 +38,7 @@ class URLTest(TestCase):
             f'/posts/{URLTest.post.id}/': 'posts/post_detail.html',
             f'/posts/{URLTest.post.id}/edit/': 'posts/create_post.html',
             '/create/': 'posts/create_post.html',
+            '/search/': 'posts/search.html',
         }
         for adress, template in templates_url_names.items():
             with self.subTest(adress=adress):
@@ -1,14 +1,20 @@
+import base64
 import shutil
 import tempfile
 
 from django import forms
 from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.test import Client, TestCase, override_settings
 from django.urls import reverse
 
+from core.templatetags.pagination import about_count
+
+from .. import feed_cache
 from ..models import Follow, Group, Post
+from ..paginators import COUNT_KEY
 
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
 
@@ -25,6 +31,7 @@ class PagesTests(TestCase):
     @classmethod
     def setUpClass(cls):
         super().setUpClass()
+        cache.clear()
         cls.user = User.objects.create_user(username='auth')
         cls.another_user_1 = User.objects.create_user(
             username='another_auth_1'
@@ -265,6 +272,7 @@ class PaginatorViewsTest(TestCase):
     @classmethod
     def setUpClass(cls):
         super().setUpClass()
+        cache.clear()
         cls.user = User.objects.create_user(username='auth')
         cls.group = Group.objects.create(
             title='title',
@@ -304,11 +312,149 @@ class PaginatorViewsTest(TestCase):
                 response = self.authorized_client.get((url) + '?page=2')
                 self.assertEqual(len(response.context['page_obj']), 3)
 
+    @override_settings(PAGINATOR_OBJECTS_PER_PAGE=1)
+    def test_page_range_is_elided(self):
+        """Paginator показывает края и окно вокруг текущей страницы."""
+        response = self.authorized_client.get(
+            reverse('posts:index') + '?page=7'
+        )
+        page_obj = response.context['page_obj']
+        self.assertEqual(
+            list(page_obj.paginator.get_elided_page_range(page_obj.number)),
+            [1, 2, '…', 4, 5, 6, 7, 8, 9, 10, '…', 12, 13],
+        )
+        self.assertContains(response, 'href="?page=12"')
+        self.assertNotContains(response, 'href="?page=3"')
+        self.assertNotContains(response, 'href="?page=11"')
+
+
+@override_settings(PAGINATOR_EXACT_COUNT_LIMIT=5)
+class FeedCountTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cache.clear()
+        cls.author = User.objects.create_user(username='author')
+        cls.follower = User.objects.create_user(username='follower')
+        Follow.objects.create(user=cls.follower, author=cls.author)
+        for i in range(13):
+            Post.objects.create(author=cls.author, text=f'text_{i}')
+        cls.follower_client = Client()
+        cls.follower_client.force_login(cls.follower)
+
+    def setUp(self):
+        cache.clear()
+
+    def get_count_key(self):
+        return COUNT_KEY.format(feed_cache.follow_feed(self.follower.pk))
+
+    def test_large_counts_are_cached(self):
+        """Число записей большой ленты берётся из кэша и округляется."""
+        url = reverse('posts:follow_index')
+        response = self.follower_client.get(url)
+        self.assertEqual(response.context['page_obj'].paginator.count, 13)
+        self.assertEqual(cache.get(self.get_count_key()), 13)
+        cache.set(self.get_count_key(), 123456)
+        feed_cache.bump(feed_cache.follow_feed(self.follower.pk))
+        response = self.follower_client.get(url)
+        self.assertContains(response, about_count(123456))
+        self.assertEqual(about_count(123456), 'около 120\u00a0000')
+
+    @override_settings(PAGINATOR_EXACT_COUNT_LIMIT=20)
+    def test_small_counts_are_exact(self):
+        """Небольшие ленты считаются точно и не кэшируются."""
+        response = self.follower_client.get(reverse('posts:follow_index'))
+        paginator = response.context['page_obj'].paginator
+        self.assertEqual(paginator.count, 13)
+        self.assertFalse(paginator.approximate)
+        self.assertNotContains(response, 'около')
+        self.assertIsNone(cache.get(self.get_count_key()))
+
+
+class CursorPaginatorViewsTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cache.clear()
+        cls.user = User.objects.create_user(username='auth')
+        cls.group = Group.objects.create(
+            title='title',
+            slug='slug',
+            description='description',
+        )
+        for i in range(13):
+            Post.objects.create(
+                author=cls.user,
+                group=cls.group,
+                text=f'text_{i}',
+            )
+        Follow.objects.create(
+            user=User.objects.create_user(username='follower'),
+            author=cls.user,
+        )
+        cls.authorized_client = Client()
+        cls.authorized_client.force_login(cls.user)
+        cls.follower_client = Client()
+        cls.follower_client.force_login(
+            User.objects.get(username='follower')
+        )
+        cls.urls = {
+            reverse('posts:index'): cls.authorized_client,
+            reverse('posts:group_posts', kwargs={'slug': cls.group.slug}):
+            cls.authorized_client,
+            reverse('posts:profile', kwargs={'username': cls.user.username}):
+            cls.authorized_client,
+            reverse('posts:follow_index'): cls.follower_client,
+        }
+
+    def test_next_and_previous_cursor(self):
+        """Курсор ведёт на следующую страницу и обратно."""
+        for url, client in self.urls.items():
+            with self.subTest(value=url):
+                first_page = client.get(url).context['page_obj']
+                first_texts = [post.text for post in first_page]
+                next_cursor = first_page.paginator.next_cursor(first_page)
+                second_page = client.get(
+                    url, {'cursor': next_cursor}
+                ).context['page_obj']
+                self.assertEqual(len(second_page), 3)
+                self.assertFalse(second_page.has_next())
+                self.assertEqual(
+                    [post.text for post in second_page],
+                    ['text_2', 'text_1', 'text_0'],
+                )
+                back_page = client.get(
+                    url, {'cursor': second_page.previous_cursor}
+                ).context['page_obj']
+                self.assertEqual(
+                    [post.text for post in back_page],
+                    first_texts,
+                )
+                self.assertFalse(back_page.has_previous())
+
+    def test_invalid_cursor_shows_first_page(self):
+        """Битый курсор открывает первую страницу."""
+        naive = base64.urlsafe_b64encode(
+            b'n|2026-01-01T00:00:00|5'
+        ).decode()
+        overflow = base64.urlsafe_b64encode(
+            b'n|9999-12-31T23:00:00-05:00|1'
+        ).decode()
+        for cursor in ('broken', naive, overflow):
+            with self.subTest(cursor=cursor):
+                response = self.authorized_client.get(
+                    reverse('posts:index'), {'cursor': cursor}
+                )
+                self.assertEqual(response.context['page_obj'].number, 1)
+                self.assertEqual(len(response.context['page_obj']), 10)
+
 
 class PostGroupTests(TestCase):
     @classmethod
     def setUpClass(cls):
         super().setUpClass()
+        cache.clear()
         cls.user = User.objects.create_user(username='auth')
         cls.group_1 = Group.objects.create(
             title='title_1',
@@ -0,0 +1,18 @@
+"""Код процессов пула миниатюр.
+
+Модуль импортируется в новом процессе до настройки Django, поэтому
+Django и sorl-thumbnail загружаются только внутри функций.
+"""
+import os
+
+
+def setup(settings_module):
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', settings_module)
+    import django
+    django.setup()
+
+
+def generate(name, thumbnails):
+    from sorl.thumbnail import get_thumbnail
+    for geometry, options in thumbnails:
+        get_thumbnail(name, geometry, **options)
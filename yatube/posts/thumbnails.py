@@ -0,0 +1,203 @@
+"""Миниатюры картинок постов, создаваемые вне запроса.
+
+Шаблоны берут миниатюру только из хранилища sorl-thumbnail и, пока её
+нет, показывают заглушку. Все размеры из POST_THUMBNAILS строит пул
+процессов: сразу после сохранения картинки и при первом показе, если
+миниатюры ещё нет. Когда они готовы, updated поста обновляется и ленты
+с ним сбрасываются, чтобы закэшированные карточки с заглушкой
+пересобрались.
+
+Процессам нужна общая с сайтом база: с базой в памяти (в тестах) или
+при THUMBNAIL_WORKERS = 0 миниатюры строятся прямо в запросе.
+
+Если картинку обработать не удалось, она THUMBNAIL_FAILURE_TIMEOUT
+секунд не ставится в очередь снова, и всё это время показывается
+заглушка.
+"""
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections, connection
+from django.templatetags.static import static
+from django.utils import timezone
+from sorl.thumbnail import default
+from sorl.thumbnail.base import ThumbnailBackend
+from sorl.thumbnail.conf import defaults as default_settings
+from sorl.thumbnail.conf import settings as thumbnail_settings
+from sorl.thumbnail.helpers import toint
+from sorl.thumbnail.images import DummyImageFile, ImageFile
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.parsers import parse_geometry
+
+from . import feed_cache, object_cache, thumbnail_worker
+from .models import Post
+
+logger = logging.getLogger(__name__)
+
+FAILED_KEY = 'thumbnail_failed:{}'
+
+_executor = None
+_pending = set()
+_lock = threading.Lock()
+
+
+class Placeholder(DummyImageFile):
+    @property
+    def url(self):
+        return static(settings.THUMBNAIL_PLACEHOLDER)
+
+
+class ReadyThumbnailBackend(ThumbnailBackend):
+    def get_thumbnail_file(self, file_, geometry_string, **options):
+        """Файл миниатюры с тем же именем, что строит get_thumbnail()."""
+        source = ImageFile(file_)
+        if thumbnail_settings.THUMBNAIL_PRESERVE_FORMAT:
+            options.setdefault('format', self._get_format(source))
+        for key, value in self.default_options.items():
+            options.setdefault(key, value)
+        for key, attr in self.extra_options:
+            value = getattr(thumbnail_settings, attr)
+            if value != getattr(default_settings, attr):
+                options.setdefault(key, value)
+        name = self._get_thumbnail_filename(source, geometry_string, options)
+        return ImageFile(name, default.storage)
+
+    def get_ready_thumbnail(self, file_, geometry_string, **options):
+        """Возвращает миниатюру, если она уже создана, иначе None."""
+        return default.kvstore.get(
+            self.get_thumbnail_file(file_, geometry_string, **options)
+        )
+
+    def forget_missing(self, file_, thumbnails):
+        """Сбрасывает закэшированный промах kvstore: запись процесса пула
+        не вытесняет его из L1 процессов сайта, а удаление вытесняет."""
+        default.kvstore.cache.delete_many([
+            add_prefix(self.get_thumbnail_file(
+                file_, geometry, **options
+            ).key)
+            for geometry, options in thumbnails
+        ])
+
+
+backend = ReadyThumbnailBackend()
+
+
+def get_executor(restart=False):
+    global _executor
+    with _lock:
+        if restart and _executor is not None:
+            _executor.shutdown(wait=False)
+            _executor = None
+        if _executor is None:
+            _executor = ProcessPoolExecutor(
+                max_workers=settings.THUMBNAIL_WORKERS,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=thumbnail_worker.setup,
+                initargs=(os.environ['DJANGO_SETTINGS_MODULE'],),
+            )
+        return _executor
+
+
+def uses_workers():
+    return bool(settings.THUMBNAIL_WORKERS) and not (
+        connection.vendor == 'sqlite' and connection.is_in_memory_db()
+    )
+
+
+def remember_failure(name):
+    logger.exception('Не удалось создать миниатюры для %s', name)
+    cache.set(
+        FAILED_KEY.format(name), True, settings.THUMBNAIL_FAILURE_TIMEOUT
+    )
+
+
+def finish(name, post_id, future):
+    try:
+        future.result()
+    except Exception:
+        remember_failure(name)
+        return
+    finally:
+        # Отметка о сбое ставится раньше, чем имя уходит из очереди.
+        with _lock:
+            _pending.discard(name)
+    try:
+        backend.forget_missing(name, settings.POST_THUMBNAILS)
+        posts = list(Post.objects.filter(pk=post_id, image=name).only(
+            'author_id', 'group_id', 'pub_date'
+        ))
+        Post.objects.filter(pk__in=[post.pk for post in posts]).update(
+            updated=timezone.now()
+        )
+        object_cache.forget_posts([post_id])
+        if posts:
+            feed_cache.bump(*feed_cache.post_feeds(posts))
+    except Exception:
+        logger.exception('Не удалось обновить пост с картинкой %s', name)
+    finally:
+        close_old_connections()
+
+
+def schedule(post):
+    """Ставит в очередь создание всех миниатюр картинки поста."""
+    name = post.image.name
+    if cache.get(FAILED_KEY.format(name)):
+        return
+    if not uses_workers():
+        try:
+            thumbnail_worker.generate(name, settings.POST_THUMBNAILS)
+        except Exception:
+            remember_failure(name)
+        return
+    with _lock:
+        if name in _pending:
+            return
+        _pending.add(name)
+    job = (thumbnail_worker.generate, name, settings.POST_THUMBNAILS)
+    try:
+        future = get_executor().submit(*job)
+    except BrokenProcessPool:
+        # Упавший процесс ломает весь пул: его нужно пересоздать.
+        future = get_executor(restart=True).submit(*job)
+    future.add_done_callback(
+        lambda future: finish(name, post.pk, future)
+    )
+
+
+def thumbnail_size(post, geometry, **options):
+    """Размер будущей миниатюры по сохранённому размеру картинки — так
+    же, как его считает sorl, но без чтения файла."""
+    if not post.image_width or not post.image_height:
+        return None
+    options = {**backend.default_options, **options}
+    width, height = post.image_width, post.image_height
+    x, y = parse_geometry(geometry, width / height)
+    factors = (x / width, y / height)
+    factor = max(factors) if options['crop'] else min(factors)
+    if factor < 1 or options['upscale']:
+        width, height = toint(width * factor), toint(height * factor)
+    if options['crop']:
+        width, height = min(width, x), min(height, y)
+    return width, height
+
+
+def get_thumbnail(post, geometry, **options):
+    """Готовая миниатюра картинки поста или заглушка того же размера."""
+    thumbnail = backend.get_ready_thumbnail(post.image, geometry, **options)
+    if thumbnail is None:
+        schedule(post)
+        thumbnail = backend.get_ready_thumbnail(
+            post.image, geometry, **options
+        )
+    if thumbnail is None:
+        thumbnail = Placeholder(geometry)
+        size = thumbnail_size(post, geometry, **options)
+        if size is not None:
+            thumbnail.size = size
+    return thumbnail
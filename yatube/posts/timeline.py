@@ -0,0 +1,216 @@
+"""Материализованные ленты подписок.
+
+Посты обычных авторов раскладываются по лентам подписчиков при
+публикации (push). Авторы, у которых подписчиков не меньше
+TIMELINE_FANOUT_FOLLOWERS_LIMIT, в ленты не раскладываются: их посты
+подмешиваются к ленте при чтении (pull) слиянием по (pub_date, pk).
+
+Обратно к раскладке автор возвращается, только когда подписчиков
+становится меньше TIMELINE_PUSH_FOLLOWERS_LIMIT, так что автор у порога
+не переключается туда и обратно при каждой подписке. Возврат требует
+дозаполнить ленты всех подписчиков, поэтому его делает не запрос, а
+команда demote_pulled_authors, пачками подписчиков.
+"""
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count
+from django.utils import timezone
+
+from . import counters, feed_cache, hidden
+from .models import Follow, Post, PulledAuthor, TimelineEntry
+from .paginators import CachedCountPaginator, MergedCursorPaginator
+
+KEY_FIELDS = ('pub_date', 'post_id')
+
+
+def _bulk_insert(entries):
+    TimelineEntry.objects.bulk_create(
+        entries,
+        batch_size=settings.TIMELINE_BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def is_pulled(author_id):
+    return PulledAuthor.objects.filter(author_id=author_id).exists()
+
+
+def has_many_followers(author_id, limit=None):
+    if limit is None:
+        limit = settings.TIMELINE_FANOUT_FOLLOWERS_LIMIT
+    return Follow.objects.filter(author_id=author_id)[:limit].count() >= limit
+
+
+def push_post(post):
+    if is_pulled(post.author_id):
+        return
+    followers = Follow.objects.filter(author_id=post.author_id).values_list(
+        'user_id', flat=True
+    )
+    _bulk_insert(
+        TimelineEntry(
+            user_id=user_id,
+            post_id=post.pk,
+            author_id=post.author_id,
+            pub_date=post.pub_date,
+        )
+        for user_id in followers.iterator()
+    )
+
+
+def backfill(user_id, author_id):
+    posts = Post.objects.filter(author_id=author_id).values_list(
+        'pk', 'pub_date'
+    )
+    _bulk_insert(
+        TimelineEntry(
+            user_id=user_id,
+            post_id=pk,
+            author_id=author_id,
+            pub_date=pub_date,
+        )
+        for pk, pub_date in posts.iterator()
+    )
+
+
+def prune(user_id, author_id):
+    TimelineEntry.objects.filter(user_id=user_id, author_id=author_id).delete()
+
+
+def follow(user_id, author_id):
+    if is_pulled(author_id):
+        return
+    if has_many_followers(author_id):
+        PulledAuthor.objects.get_or_create(author_id=author_id)
+        return
+    backfill(user_id, author_id)
+
+
+def unfollow(user_id, author_id):
+    prune(user_id, author_id)
+
+
+def get_demotable_author_ids():
+    """pull-авторы, у которых подписчиков стало меньше
+    TIMELINE_PUSH_FOLLOWERS_LIMIT."""
+    return [
+        author_id
+        for author_id in PulledAuthor.objects.values_list(
+            'author_id', flat=True
+        )
+        if not has_many_followers(
+            author_id, settings.TIMELINE_PUSH_FOLLOWERS_LIMIT
+        )
+    ]
+
+
+def fill_followers(author_id, posts, batch_size):
+    """Дозаполняет ленты подписчиков; в одной транзакции — около
+    batch_size записей."""
+    followers = Follow.objects.filter(author_id=author_id)
+    followers_per_batch = max(batch_size // max(len(posts), 1), 1)
+    for pks in counters.batches(followers, followers_per_batch):
+        user_ids = Follow.objects.filter(pk__in=pks).values_list(
+            'user_id', flat=True
+        )
+        with transaction.atomic():
+            _bulk_insert(
+                TimelineEntry(
+                    user_id=user_id,
+                    post_id=pk,
+                    author_id=author_id,
+                    pub_date=pub_date,
+                )
+                for user_id in user_ids
+                for pk, pub_date in posts
+            )
+        yield len(pks)
+
+
+def demote(author_id, batch_size):
+    """Возвращает автора к раскладке по лентам; отдаёт число
+    дозаполненных лент в каждой пачке.
+
+    Пока автор помечен pull, его записи в лентах не показываются, так что
+    ленты дозаполняются до снятия пометки. Посты, вышедшие за это время,
+    раскладываются после неё.
+    """
+    started = timezone.now()
+    posts = Post.objects.filter(author_id=author_id).values_list(
+        'pk', 'pub_date'
+    )
+    yield from fill_followers(
+        author_id, list(posts.filter(pub_date__lt=started)), batch_size
+    )
+    PulledAuthor.objects.filter(author_id=author_id).delete()
+    missed = list(posts.filter(pub_date__gte=started))
+    if missed:
+        for _ in fill_followers(author_id, missed, batch_size):
+            pass
+
+
+def rebuild(user_ids=None):
+    entries = TimelineEntry.objects.all()
+    follows = Follow.objects.all()
+    if user_ids is None:
+        PulledAuthor.objects.all().delete()
+        PulledAuthor.objects.bulk_create(
+            PulledAuthor(author_id=author_id)
+            for author_id in Follow.objects.values('author').annotate(
+                followers=Count('pk')
+            ).filter(
+                followers__gte=settings.TIMELINE_FANOUT_FOLLOWERS_LIMIT
+            ).values_list('author', flat=True)
+        )
+    else:
+        entries = entries.filter(user_id__in=user_ids)
+        follows = follows.filter(user_id__in=user_ids)
+    entries.delete()
+    count = 0
+    pulled = PulledAuthor.objects.values('author')
+    for user_id, author_id in follows.exclude(author__in=pulled).values_list(
+        'user_id', 'author_id'
+    ).iterator():
+        backfill(user_id, author_id)
+        count += 1
+    return count
+
+
+def hydrate(entries):
+    return [entry.post for entry in entries]
+
+
+def get_pulled_author_ids(user):
+    return list(hidden.visible(Follow.objects.filter(
+        user=user,
+        author__in=PulledAuthor.objects.values('author'),
+    )).values_list('author_id', flat=True))
+
+
+def get_paginator(user, per_page, pulled_ids=None):
+    if pulled_ids is None:
+        pulled_ids = get_pulled_author_ids(user)
+    inbox = CachedCountPaginator(
+        hidden.visible(TimelineEntry.objects.filter(user=user).exclude(
+            author_id__in=pulled_ids
+        )).select_related('post__author', 'post__group'),
+        per_page,
+        count_key=feed_cache.follow_feed(user.pk),
+        key_fields=KEY_FIELDS,
+        hydrate=hydrate,
+    )
+    if not pulled_ids:
+        return inbox
+    return MergedCursorPaginator(
+        [inbox] + [
+            CachedCountPaginator(
+                Post.objects.filter(author_id=pk).select_related(
+                    'author', 'group'
+                ),
+                per_page,
+                count_key=feed_cache.profile_feed(pk),
+            )
+            for pk in pulled_ids
+        ],
+        per_page,
+    )
@@ -1,43 +1,51 @@
 from django.conf import settings
 from django.contrib.auth.decorators import login_required
-from django.core.paginator import Paginator
 from django.shortcuts import get_object_or_404, redirect, render
 
+from . import (counters, feed_cache, hidden, object_cache, search,
+               thumbnails, timeline)
 from .forms import CommentForm, PostForm
-from .models import Comment, Follow, Group, Post, User
+from .models import Comment, Follow, Post, User
+from .page_cache import cache_anonymous_page
+from .paginators import get_page_obj, get_requested_page
 
 
+@cache_anonymous_page
 def index(request):
-    post_list = Post.objects.all().order_by('-pub_date')
-    paginator = Paginator(post_list, settings.PAGINATOR_OBJECTS_PER_PAGE)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    post_list = hidden.visible(Post.objects.select_related('author', 'group'))
+    page_obj = get_page_obj(request, post_list, feed=feed_cache.INDEX)
     context = {
         'page_obj': page_obj,
+        **feed_cache.get_cache_context(request, feed_cache.INDEX),
     }
     return render(request, 'index.html', context)
 
 
+@cache_anonymous_page
 def group_posts(request, slug):
-    group = get_object_or_404(Group, slug=slug)
-    posts = Post.objects.filter(group=group).order_by('-pub_date')
-    paginator = Paginator(posts, settings.PAGINATOR_OBJECTS_PER_PAGE)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    group = object_cache.get_group_or_404(slug)
+    posts = hidden.visible(group.posts.select_related('author', 'group'))
+    page_obj = get_page_obj(
+        request, posts, feed=feed_cache.group_feed(group.pk)
+    )
     context = {
         'group': group,
         'page_obj': page_obj,
+        **feed_cache.get_cache_context(
+            request, feed_cache.group_feed(group.pk)
+        ),
     }
     return render(request, 'group_list.html', context)
 
 
+@cache_anonymous_page
 def profile(request, username):
-    user = get_object_or_404(User, username=username)
-    post_list = Post.objects.filter(author=user).order_by('-pub_date')
-    paginator = Paginator(post_list, settings.PAGINATOR_OBJECTS_PER_PAGE)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
-    post_number = paginator.count
+    user = object_cache.get_user_or_404(username)
+    post_list = user.posts.select_related('author', 'group')
+    page_obj = get_page_obj(
+        request, post_list, feed=feed_cache.profile_feed(user.pk)
+    )
+    user_counters = counters.get_user_counters(user)
     if request.user.is_authenticated:
         following = Follow.objects.filter(
             user=request.user,
@@ -48,15 +56,20 @@ def profile(request, username):
     context = {
         'page_obj': page_obj,
         'author': user,
-        'post_number': post_number,
+        'post_number': user_counters.posts_count,
+        'counters': user_counters,
         'post_list': post_list,
         'following': following,
+        **feed_cache.get_cache_context(
+            request, feed_cache.profile_feed(user.pk)
+        ),
     }
     return render(request, 'posts/profile.html', context)
 
 
+@cache_anonymous_page
 def post_detail(request, post_id):
-    post = get_object_or_404(Post, pk=post_id)
+    post = object_cache.get_post_or_404(post_id)
     form = CommentForm(
         request.POST or None,
         instance=post,
@@ -64,11 +77,19 @@ def post_detail(request, post_id):
     if form.is_valid():
         form.save()
         return redirect('posts:post_detail', post_id=post_id)
+    feed_cache.add_tags(
+        request,
+        feed_cache.GROUPS,
+        feed_cache.post_page(post.pk),
+        feed_cache.profile_feed(post.author_id),
+    )
     post_first30 = post.text[0:29]
-    post_number = Post.objects.filter(author=post.author).count()
+    post_number = counters.get_user_counters(post.author).posts_count
     post_group = post.group
     user = request.user
-    comments = Comment.objects.filter(post_id=post_id)
+    comments = hidden.visible(
+        Comment.objects.filter(post_id=post_id).select_related('author')
+    ).order_by('created')
     context = {
         'post': post,
         'post_number': post_number,
@@ -81,6 +102,20 @@ def post_detail(request, post_id):
     return render(request, 'posts/post_detail.html', context)
 
 
+def post_search(request):
+    query = request.GET.get('q', '').strip()
+    page = search.search(
+        query,
+        settings.PAGINATOR_OBJECTS_PER_PAGE,
+        request.GET.get('cursor'),
+    )
+    context = {
+        'query': query,
+        'page': page,
+    }
+    return render(request, 'posts/search.html', context)
+
+
 @login_required
 def post_create(request):
 
@@ -91,6 +126,8 @@ def post_create(request):
             post = form.save(commit=False)
             post.author = request.user
             post.save()
+            if post.image:
+                thumbnails.schedule(post)
             return redirect('posts:profile', username=request.user)
 
         context = {
@@ -108,7 +145,7 @@ def post_create(request):
 @login_required
 def post_edit(request, post_id):
 
-    post = get_object_or_404(Post, pk=post_id)
+    post = object_cache.get_post_or_404(post_id)
     is_edit = True
 
     if post.author != request.user:
@@ -120,7 +157,12 @@ def post_edit(request, post_id):
         files=request.FILES or None
     )
     if form.is_valid():
-        form.save()
+        # Пост из кэша объектов может быть устаревшим: полное сохранение
+        # вернуло бы старое значение comments_count.
+        post = form.save(commit=False)
+        post.save(update_fields=PostForm.UPDATE_FIELDS)
+        if post.image and 'image' in form.changed_data:
+            thumbnails.schedule(post)
         return redirect('posts:post_detail', post_id=post_id)
 
     context = {
@@ -133,7 +175,7 @@ def post_edit(request, post_id):
 
 @login_required
 def add_comment(request, post_id):
-    post = get_object_or_404(Post, pk=post_id)
+    post = object_cache.get_post_or_404(post_id)
     form = CommentForm(request.POST or None)
     if form.is_valid():
         comment = form.save(commit=False)
@@ -145,14 +187,18 @@ def add_comment(request, post_id):
 
 @login_required
 def follow_index(request):
-    posts = Post.objects.filter(
-        author__following__user=request.user
-    ).order_by('-pub_date')
-    paginator = Paginator(posts, settings.PAGINATOR_OBJECTS_PER_PAGE)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    pulled_ids = timeline.get_pulled_author_ids(request.user)
+    paginator = timeline.get_paginator(
+        request.user, settings.PAGINATOR_OBJECTS_PER_PAGE, pulled_ids
+    )
+    page_obj = get_requested_page(request, paginator)
     context = {
         'page_obj': page_obj,
+        **feed_cache.get_cache_context(
+            request,
+            feed_cache.follow_feed(request.user.pk),
+            *(feed_cache.profile_feed(pk) for pk in pulled_ids),
+        ),
     }
     return render(request, 'posts/follow.html', context)
 
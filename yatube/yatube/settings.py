@@ -115,8 +115,118 @@ MEDIA_URL = '/media/'
 
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+SHARED_CACHE = {
+    'BACKEND': 'core.cache_backends.sqlite.SQLiteCache',
+    'LOCATION': os.path.join(BASE_DIR, 'cache', 'cache.sqlite3'),
+    'OPTIONS': {
+        'MAX_ENTRIES': 100000,
+    },
+}
+
+# 'default' держит горячие ключи в памяти процесса и читает остальное из
+# 'l2' — общего для воркеров файла SQLite, поэтому инвалидация,
+# блокировки и списки id согласованы между ними. Файл у 'l2' отдельный:
+# clear() и метка версии 'default' не задевают хранилище миниатюр.
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-    }
+        'BACKEND': 'core.cache_backends.tiered.TieredCache',
+        'OPTIONS': {
+            'L2': 'l2',
+            'L1_MAX_ENTRIES': 1000,
+            'L1_TIMEOUT': 5,
+            'L1_CHECK_INTERVAL': 1,
+        },
+    },
+    'l2': {
+        **SHARED_CACHE,
+        'LOCATION': os.path.join(BASE_DIR, 'cache', 'default.sqlite3'),
+    },
+    'shared': SHARED_CACHE,
+    # Хранилище sorl-thumbnail: общий L2 нужен процессам пула миниатюр.
+    'thumbnails': {
+        'BACKEND': 'core.cache_backends.tiered.TieredCache',
+        'LOCATION': 'thumbnails',
+        'OPTIONS': {
+            'L2': 'shared',
+            'L1_MAX_ENTRIES': 5000,
+            'L1_TIMEOUT': 60,
+            'L1_CHECK_INTERVAL': 1,
+        },
+    },
 }
+
+# Кэши SQLite на время тестов переносятся во временный каталог.
+TEST_RUNNER = 'core.test_runner.TestRunner'
+
+TIMELINE_BATCH_SIZE = 500
+
+TIMELINE_FANOUT_FOLLOWERS_LIMIT = 10000
+
+# Автор, читаемый через pull, возвращается к раскладке по лентам, только
+# когда подписчиков становится меньше этого числа.
+TIMELINE_PUSH_FOLLOWERS_LIMIT = 8000
+
+FEED_CACHE_TIMEOUT = 60 * 60 * 4
+
+PAGE_CACHE_TIMEOUT = 60 * 60
+
+# Сколько устаревшая копия фрагмента может отдаваться после истечения
+# срока, пока другой запрос её пересобирает.
+CACHE_STALE_TIMEOUT = 60 * 10
+
+CACHE_LOCK_TIMEOUT = 30
+
+CACHE_LOCK_WAIT = 2
+
+FEED_ID_CACHE_LENGTH = 1000
+
+FEED_ID_CACHE_TIMEOUT = 60 * 60 * 24
+
+OBJECT_CACHE_TIMEOUT = 60 * 60 * 24
+
+COUNTERS_BATCH_SIZE = 1000
+
+BULK_BATCH_SIZE = 500
+
+# Миниатюры картинок постов, которые строятся сразу после загрузки.
+POST_THUMBNAILS = [
+    ('960x339', {'crop': 'center', 'upscale': True}),
+]
+
+# Загруженные картинки уменьшаются до этого размера по большей стороне
+# и перекодируются с этим качеством JPEG.
+POST_IMAGE_MAX_SIZE = 1920
+
+POST_IMAGE_QUALITY = 85
+
+THUMBNAIL_WORKERS = 2
+
+THUMBNAIL_PLACEHOLDER = 'img/thumbnail_placeholder.svg'
+
+# Сколько секунд не пытаться снова построить миниатюры картинки, которую
+# не удалось обработать.
+THUMBNAIL_FAILURE_TIMEOUT = 60 * 60
+
+THUMBNAIL_KVSTORE = 'core.thumbnail_kvstore.KVStore'
+
+THUMBNAIL_ENGINE = 'core.thumbnail_engine.Engine'
+
+# Картинки больше этого числа пикселей движок миниатюр не открывает.
+THUMBNAIL_MAX_PIXELS = 50 * 1000 * 1000
+
+# Во сколько раз итоговый размер меньше исходного, прежде чем resize
+# уменьшает картинку в целое число раз (см. Image.resize в Pillow).
+THUMBNAIL_REDUCING_GAP = 3.0
+
+THUMBNAIL_CACHE = 'thumbnails'
+
+THUMBNAIL_CACHE_TIMEOUT = 60 * 60 * 24 * 30
+
+# Сколько секунд помнить, что миниатюры нет в хранилище.
+THUMBNAIL_MISS_TIMEOUT = 60
+
+# Выборки больше этого числа записей paginator считает через кэш и
+# показывает округлённо.
+PAGINATOR_EXACT_COUNT_LIMIT = 1000
+
+PAGINATOR_COUNT_TIMEOUT = 60 * 10